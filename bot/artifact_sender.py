@@ -2,13 +2,14 @@
 This module provides functions for sending various types of artifacts (e.g., zipped folders, text files)
 to users via the Telegram bot, often involving temporary storage and Minio upload/download operations.
 """
+import asyncio
 import os
 import tempfile
 import shutil
-import json
+import orjson
 from telegram.ext import ContextTypes
 from telegram import Update, InputFile # Import InputFile for sending files
-from storage.minio_client import upload
+from storage.minio_client import MINIO_BUCKET, upload
 from logs.logger import log_error
 
 async def send_folder_as_zip(context: ContextTypes.DEFAULT_TYPE, chat_id: int, folder_path: str, zip_filename: str) -> None:
@@ -55,7 +56,7 @@ async def send_folder_as_zip(context: ContextTypes.DEFAULT_TYPE, chat_id: int, f
         
         # Upload the zip file to MinIO
         minio_path = f"{run_id}/{zip_filename}"
-        upload(os.getenv("MINIO_BUCKET"), minio_path, zip_content)
+        await asyncio.to_thread(upload, MINIO_BUCKET, minio_path, zip_content)
 
         # Create another temporary directory to hold the zip file with the final name
         # This is necessary because send_document requires a file object with the correct filename
@@ -122,7 +123,7 @@ async def send_step_artifacts_if_available(update: Update, context: ContextTypes
     elif step_name == "Generating Test Cases":
         if ctx.get("testcases_json"):
             # Convert JSON object to a pretty-printed string for readability
-            testcases_str = json.dumps(ctx["testcases_json"], indent=2, ensure_ascii=False)
+            testcases_str = orjson.dumps(ctx["testcases_json"], option=orjson.OPT_INDENT_2).decode("utf-8")
             await send_content_as_file_from_minio(context, chat_id, run_id, "testcases.json", "📋 Generated Test Cases (JSON)", testcases_str)
             sent_count += 1
 
@@ -283,7 +284,7 @@ async def send_content_as_file_from_minio(context: ContextTypes.DEFAULT_TYPE, ch
     temp_dir = None # Initialize temp_dir to None
     try:
         # Upload content to MinIO
-        upload(os.getenv("MINIO_BUCKET"), minio_path, content.encode('utf-8'))
+        await asyncio.to_thread(upload, MINIO_BUCKET, minio_path, content.encode('utf-8'))
 
         # Create a temporary directory and file to prepare for sending to Telegram
         temp_dir = tempfile.mkdtemp()
@@ -2,23 +2,37 @@
 This module contains the Telegram bot's handler functions for various commands and messages.
 It manages the interaction with users, file uploads, pipeline execution, and state management.
 """
+import asyncio
 import os
+import random
+import re
 from telegram import Update, InputFile
 from telegram.ext import ContextTypes
 import tempfile
-from pipeline.runner import initialize_pipeline, PIPELINE_STEPS
+from pipeline.runner import initialize_pipeline, STEP_NAMES, STEP_FUNCTIONS
 from bot.keyboards import get_main_keyboard
 from bot.state_manager import (
     pipeline_runs,
     step_retry_counts,
+    clear_step_retry_counts,
+    discard_chat_lock,
+    chat_locks,
     save_context_to_minio,
     load_context_from_minio,
     delete_context_from_minio,
+    cleanup_stale_contexts,
 )
 from bot.artifact_sender import send_step_artifacts_if_available
 from utils.exceptions import PipelineError, StorageError, LLMError
 from logs.logger import log_error
-from storage.minio_client import upload
+from storage.minio_client import MINIO_BUCKET, upload
+
+# Number of automatic attempts for a step when the LLM service is temporarily unavailable
+STEP_MAX_ATTEMPTS = 3
+# HTTP statuses of LLM errors that indicate a transient, retryable failure (rate limited, overloaded)
+TRANSIENT_LLM_STATUS_CODES = frozenset({429, 503})
+# Whole words in LLM error messages that indicate a transient failure, for errors without an HTTP status
+TRANSIENT_LLM_ERROR_PATTERN = re.compile(r"\b(?:503|429|UNAVAILABLE|overloaded)\b")
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
@@ -87,12 +101,13 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             with open(file_path, 'rb') as f:
                 content_bytes = f.read()
 
-        upload(os.getenv("MINIO_BUCKET"), doc.file_name, content_bytes)
-        ctx = initialize_pipeline(doc.file_name)
+        # Minio I/O is blocking, so run it in a worker thread to keep the event loop responsive
+        await asyncio.to_thread(upload, MINIO_BUCKET, doc.file_name, content_bytes)
+        ctx = await asyncio.to_thread(initialize_pipeline, doc.file_name)
         pipeline_runs[chat_id] = ctx["run_id"]
-        save_context_to_minio(ctx)
+        await asyncio.to_thread(save_context_to_minio, ctx)
 
-        keyboard = get_main_keyboard(ctx)
+        keyboard = get_main_keyboard(ctx.get("step_index", 0), ctx["run_id"])
         await context.bot.send_message(
             chat_id=chat_id,
             text=f"📥 Pipeline initialized for `{doc.file_name}`\n"
@@ -140,6 +155,8 @@ async def run_next_step(update: Update, context: ContextTypes.DEFAULT_TYPE, run_
     Manages the execution of the next step in the pipeline or retries the current step.
     It loads the pipeline's state, checks if the pipeline is completed, and then
     calls either `_execute_step` or `_retry_step` based on the `is_retry` flag.
+    Execution is serialized per chat, so repeated button presses while a step is
+    running are answered and dropped instead of running the step twice.
 
     Args:
         update (Update): The Telegram update object.
@@ -148,37 +165,92 @@ async def run_next_step(update: Update, context: ContextTypes.DEFAULT_TYPE, run_
         is_retry (bool): A flag indicating if the current call is a retry attempt for a step.
     """
     chat_id = update.effective_chat.id
-    try:
-        ctx = load_context_from_minio(run_id)
-        pipeline_runs[chat_id] = run_id
-    except StorageError:
-        await context.bot.send_message(
-            chat_id=chat_id, text="❌ Pipeline state not found. Please upload a file again."
-        )
-        if chat_id in pipeline_runs:
-            # Clean up the entry if state is not found
-            del pipeline_runs[chat_id]
+    lock = chat_locks.setdefault(chat_id, asyncio.Lock())
+    if lock.locked():
+        # A step is already running for this chat; ignore the burst click
+        await update.callback_query.answer("⏳ A step is already running, please wait.")
         return
 
-    step_index = ctx.get("step_index", 0)
-    if step_index >= len(PIPELINE_STEPS):
-        await context.bot.send_message(chat_id=chat_id, text="✅ Pipeline already completed.")
-        # Clean up pipeline run and context as it's completed
-        del pipeline_runs[chat_id]
-        delete_context_from_minio(run_id)
-        return
+    async with lock:
+        try:
+            ctx = await asyncio.to_thread(load_context_from_minio, run_id)
+            pipeline_runs[chat_id] = run_id
+        except StorageError:
+            await context.bot.send_message(
+                chat_id=chat_id, text="❌ Pipeline state not found. Please upload a file again."
+            )
+            if chat_id in pipeline_runs:
+                # Clean up the entry if state is not found
+                del pipeline_runs[chat_id]
+            return
+
+        step_index = ctx.get("step_index", 0)
+        if step_index >= len(STEP_FUNCTIONS):
+            await context.bot.send_message(chat_id=chat_id, text="✅ Pipeline already completed.")
+            # Clean up pipeline run and context as it's completed
+            del pipeline_runs[chat_id]
+            await asyncio.to_thread(delete_context_from_minio, run_id)
+            return
 
-    step_name, step_function = PIPELINE_STEPS[step_index]
+        step_name, step_function = STEP_NAMES[step_index], STEP_FUNCTIONS[step_index]
 
-    if is_retry:
-        await _retry_step(update, context, ctx, step_name, step_function)
-    else:
-        await _execute_step(update, context, ctx, step_name, step_function)
+        if is_retry:
+            await _retry_step(update, context, ctx, step_name, step_function)
+        else:
+            await _execute_step(update, context, ctx, step_name, step_function)
+
+def _is_transient_llm_error(error: Exception) -> bool:
+    """
+    Checks whether an exception is a transient LLM failure worth retrying automatically
+    (e.g., the service is overloaded or rate limited).
+
+    Args:
+        error (Exception): The exception raised by a pipeline step.
+
+    Returns:
+        bool: True if the error is a retryable LLM error, False otherwise.
+    """
+    if not isinstance(error, LLMError):
+        return False
+    if error.status_code is not None:
+        return error.status_code in TRANSIENT_LLM_STATUS_CODES
+    return TRANSIENT_LLM_ERROR_PATTERN.search(str(error)) is not None
+
+async def _run_step_with_backoff(ctx: dict, step_name: str, step_function) -> None:
+    """
+    Runs a pipeline step in a worker thread, automatically retrying transient LLM failures
+    with exponential backoff and jitter. Waiting is done with `asyncio.sleep`, so other chats
+    are not blocked while a step backs off.
+
+    Args:
+        ctx (dict): The current pipeline context dictionary.
+        step_name (str): The name of the step being executed.
+        step_function (Callable): The function implementing the logic for the step.
+
+    Raises:
+        LLMError, PipelineError, StorageError: If the step fails with a non-transient error
+                                               or all attempts are exhausted.
+    """
+    for attempt in range(STEP_MAX_ATTEMPTS):
+        try:
+            # Step functions are blocking (LLM calls, subprocesses), so keep them off the event loop
+            await asyncio.to_thread(step_function, ctx)
+            return
+        except LLMError as e:
+            if not _is_transient_llm_error(e) or attempt == STEP_MAX_ATTEMPTS - 1:
+                raise
+            # Exponential backoff (1, 2, 4... seconds) plus random jitter to spread out retries
+            delay = (2 ** attempt) + random.random()
+            log_error(
+                f"Transient LLM error in step {step_name}, run_id {ctx.get('run_id')}: {e}. "
+                f"Retrying in {delay:.1f} seconds (attempt {attempt + 1}/{STEP_MAX_ATTEMPTS})"
+            )
+            await asyncio.sleep(delay)
 
 async def _execute_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: dict, step_name: str, step_function) -> None:
     """
     Executes a single, non-retried step of the pipeline. It sends a "running" message,
-    calls the step's function, updates the pipeline context, saves it, sends artifacts,
+    calls the step's function (automatically retrying transient LLM errors), updates the pipeline context, saves it, sends artifacts,
     and then sends a "completed" message with the next set of control buttons.
     Handles various exceptions that may occur during step execution.
 
@@ -196,18 +268,17 @@ async def _execute_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx:
         chat_id=chat_id, text=f"🚀 Running step: *{step_name}*...", parse_mode='Markdown'
     )
     try:
-        step_function(ctx)
+        await _run_step_with_backoff(ctx, step_name, step_function)
 
         # Advance to the next step
         ctx["step_index"] += 1
-        save_context_to_minio(ctx)
+        await asyncio.to_thread(save_context_to_minio, ctx)
         # Reset retry count for this step upon successful completion
-        if chat_id in step_retry_counts and step_name in step_retry_counts[chat_id]:
-            step_retry_counts[chat_id][step_name] = 0
+        step_retry_counts.pop((chat_id, step_name), None)
 
         await send_step_artifacts_if_available(update, context, ctx, step_name)
 
-        next_keyboard = get_main_keyboard(ctx)
+        next_keyboard = get_main_keyboard(ctx.get("step_index", 0), ctx["run_id"])
         await context.bot.send_message(
             chat_id=chat_id,
             text=f"✅ Step *{step_name}* completed.",
@@ -223,9 +294,8 @@ async def _execute_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx:
         # If an error occurs, the pipeline is considered failed and cleaned up
         if chat_id in pipeline_runs:
             del pipeline_runs[chat_id]
-        delete_context_from_minio(run_id)
-        if chat_id in step_retry_counts and step_name in step_retry_counts[chat_id]:
-            del step_retry_counts[chat_id][step_name]
+        await asyncio.to_thread(delete_context_from_minio, run_id)
+        step_retry_counts.pop((chat_id, step_name), None)
 
 async def _retry_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: dict, step_name: str, step_function) -> None:
     """
@@ -244,13 +314,9 @@ async def _retry_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: d
     run_id = ctx["run_id"]
     max_retries = 3 # Define maximum number of retries
     
-    # Initialize or get current retry count for this chat and step
-    if chat_id not in step_retry_counts:
-        step_retry_counts[chat_id] = {}
-    if step_name not in step_retry_counts[chat_id]:
-        step_retry_counts[chat_id][step_name] = 0
-    
-    current_retry = step_retry_counts[chat_id][step_name]
+    # Get current retry count for this chat and step (missing keys count as 0)
+    retry_key = (chat_id, step_name)
+    current_retry = step_retry_counts[retry_key]
     
     # Calculate exponential backoff delay (1, 2, 4 seconds)
     delay = 1 * (2 ** current_retry) 
@@ -262,16 +328,16 @@ async def _retry_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: d
             parse_mode='Markdown'
         )
         try:
-            step_function(ctx)
+            await _run_step_with_backoff(ctx, step_name, step_function)
 
             # If successful, advance to the next step and reset retry count
             ctx["step_index"] += 1
-            save_context_to_minio(ctx)
-            step_retry_counts[chat_id][step_name] = 0
+            await asyncio.to_thread(save_context_to_minio, ctx)
+            step_retry_counts.pop(retry_key, None)
 
             await send_step_artifacts_if_available(update, context, ctx, step_name)
 
-            next_keyboard = get_main_keyboard(ctx)
+            next_keyboard = get_main_keyboard(ctx.get("step_index", 0), ctx["run_id"])
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=f"✅ Step *{step_name}* completed.",
@@ -280,11 +346,11 @@ async def _retry_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: d
             )
         except (LLMError, PipelineError, StorageError) as e:
             # Increment retry count on failure
-            step_retry_counts[chat_id][step_name] += 1
+            step_retry_counts[retry_key] += 1
             log_error(
                 f"LLM call failed for run_id {run_id}, step {step_name}. " \
                 f"Retrying in {delay} seconds. " \
-                f"Attempt {step_retry_counts[chat_id][step_name]}/{max_retries}"
+                f"Attempt {step_retry_counts[retry_key]}/{max_retries}"
             )
             await context.bot.send_message(
                 chat_id=chat_id,
@@ -292,11 +358,9 @@ async def _retry_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: d
                      f"Retrying in {delay} seconds...",
                 parse_mode='Markdown'
             )
-            # Use a blocking sleep for simplicity in this example, but asyncio.sleep()
-            # would be preferred in a truly non-blocking async application.
-            import time
-            time.sleep(delay)
-            retry_keyboard = get_main_keyboard(ctx, is_retry_available=True)
+            # Non-blocking backoff with jitter so other chats keep being served
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
+            retry_keyboard = get_main_keyboard(ctx.get("step_index", 0), ctx["run_id"], is_retry_available=True)
             await context.bot.send_message(
                 chat_id=chat_id,
                 text=f"❌ Failed to complete *{step_name}* after internal retries. " \
@@ -313,9 +377,8 @@ async def _retry_step(update: Update, context: ContextTypes.DEFAULT_TYPE, ctx: d
         )
         # Clear pipeline state and context
         del pipeline_runs[chat_id]
-        delete_context_from_minio(run_id)
-        if chat_id in step_retry_counts and step_name in step_retry_counts[chat_id]:
-            del step_retry_counts[chat_id][step_name]
+        await asyncio.to_thread(delete_context_from_minio, run_id)
+        step_retry_counts.pop((chat_id, step_name), None)
 
 async def cancel_pipeline(update: Update, context: ContextTypes.DEFAULT_TYPE, run_id: str) -> None:
     """
@@ -332,9 +395,9 @@ async def cancel_pipeline(update: Update, context: ContextTypes.DEFAULT_TYPE, ru
     # Check if the pipeline is active for this chat and matches the run_id
     if chat_id in pipeline_runs and pipeline_runs[chat_id] == run_id:
         del pipeline_runs[chat_id]
-        if chat_id in step_retry_counts:
-            del step_retry_counts[chat_id]
-        delete_context_from_minio(run_id)
+        clear_step_retry_counts(chat_id)
+        discard_chat_lock(chat_id)
+        await asyncio.to_thread(delete_context_from_minio, run_id)
         await context.bot.send_message(chat_id=chat_id, text="❌ Pipeline cancelled.")
     else:
         await context.bot.send_message(chat_id=chat_id, text="No active pipeline to cancel or incorrect run_id.")
@@ -354,9 +417,19 @@ async def close_pipeline(update: Update, context: ContextTypes.DEFAULT_TYPE, run
     # Check if the pipeline is active for this chat and matches the run_id
     if chat_id in pipeline_runs and pipeline_runs[chat_id] == run_id:
         del pipeline_runs[chat_id]
-        if chat_id in step_retry_counts:
-            del step_retry_counts[chat_id]
-        delete_context_from_minio(run_id)
+        clear_step_retry_counts(chat_id)
+        discard_chat_lock(chat_id)
+        await asyncio.to_thread(delete_context_from_minio, run_id)
     await context.bot.send_message(
         chat_id=chat_id, text="✅ Pipeline closed. You can now start a new one by uploading a file."
-    )
\ No newline at end of file
+    )
+
+async def cleanup_contexts_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Periodic job that removes context files of abandoned pipeline runs from Minio.
+
+    Args:
+        context (ContextTypes.DEFAULT_TYPE): The context object passed by the job queue.
+    """
+    # Failures are reported by cleanup_stale_contexts through log_error
+    await asyncio.to_thread(cleanup_stale_contexts)
@@ -2,28 +2,27 @@
 This module is responsible for generating Telegram inline keyboards used to control the AI QA pipeline.
 """
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from pipeline.runner import PIPELINE_STEPS
+from pipeline.runner import STEP_NAMES
 
-def get_main_keyboard(ctx: dict, is_retry_available: bool = False) -> InlineKeyboardMarkup:
+def get_main_keyboard(step_index: int, run_id: str, is_retry_available: bool = False) -> InlineKeyboardMarkup:
     """
     Creates and returns the main inline keyboard for the Telegram bot,
     displaying buttons relevant to the current state of the pipeline (e.g., Run next step, Retry, Cancel, Close).
 
     Args:
-        ctx (dict): The current pipeline context dictionary, containing 'step_index' and 'run_id'.
+        step_index (int): The index of the next pipeline step to run.
+        run_id (str): The unique identifier of the pipeline run, embedded in the callback data.
         is_retry_available (bool): A flag indicating whether a "Retry" button should be shown
                                    for the current step. Defaults to False.
 
     Returns:
         InlineKeyboardMarkup: An InlineKeyboardMarkup object representing the main control keyboard.
     """
-    step_index = ctx.get("step_index", 0)
-    run_id = ctx.get("run_id")
     buttons = []
 
     # If there are more steps to run
-    if step_index < len(PIPELINE_STEPS):
-        step_name, _ = PIPELINE_STEPS[step_index]
+    if step_index < len(STEP_NAMES):
+        step_name = STEP_NAMES[step_index]
         if is_retry_available:
             # Add a retry button if retry is available
             buttons.append(
@@ -3,13 +3,17 @@ This module serves as the entry point for the Telegram bot application.
 It initializes the bot, registers all command and message handlers, and starts the polling process.
 """
 import os
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackQueryHandler
+from telegram.ext import AIORateLimiter, ApplicationBuilder, CommandHandler, MessageHandler, filters, CallbackQueryHandler
 from bot.handlers import (
     start,
     handle_file,
-    button_handler
+    button_handler,
+    cleanup_contexts_job
 )
 
+# How often (in seconds) abandoned pipeline contexts are removed from Minio
+CONTEXT_CLEANUP_INTERVAL = 3600
+
 def main() -> None:
     """
     Starts the Telegram bot.
@@ -20,17 +24,36 @@ def main() -> None:
     # Create artifacts directory if it doesn't exist
     os.makedirs("artifacts", exist_ok=True)
 
-    # Build the Application using the bot token from environment variables
-    app = ApplicationBuilder().token(os.getenv("TELEGRAM_BOT_TOKEN")).build()
+    # Build the Application using the bot token from environment variables.
+    # Updates from different chats are processed concurrently (steps within a chat are serialized
+    # by per-chat locks), and outgoing API calls are throttled to Telegram's flood limits.
+    app = (
+        ApplicationBuilder()
+        .token(os.getenv("TELEGRAM_BOT_TOKEN"))
+        .concurrent_updates(True)
+        .rate_limiter(AIORateLimiter())
+        .build()
+    )
 
     # Register handlers for different types of updates
     app.add_handler(CommandHandler("start", start)) # Handles the /start command
     app.add_handler(MessageHandler(filters.Document.ALL, handle_file)) # Handles all document uploads
     app.add_handler(CallbackQueryHandler(button_handler)) # Handles inline keyboard button presses
 
+    # Periodically remove contexts of runs that were never closed or cancelled
+    app.job_queue.run_repeating(cleanup_contexts_job, interval=CONTEXT_CLEANUP_INTERVAL, first=CONTEXT_CLEANUP_INTERVAL)
+
     # Start the bot's polling mechanism to listen for updates
     app.run_polling()
 
 if __name__ == "__main__":
+    # Use uvloop as the asyncio event loop when available (not supported on Windows);
+    # PTB picks up the installed event loop policy automatically
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
     # Ensures that main() is called only when the script is executed directly
     main()
\ No newline at end of file
@@ -1,12 +1,42 @@
 """
 This module handles the in-memory and Minio-based state management for the AI QA pipeline runs.
 It stores temporary pipeline execution data and context, allowing for state persistence across steps.
+Contexts are stored in Minio as Zstandard-compressed MessagePack (or JSON, see CONTEXT_FORMAT).
 """
+import asyncio
 import os
-from collections import defaultdict
-from storage.minio_client import upload_json, download_json
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from dataclasses import fields
+from functools import lru_cache
+from typing import Optional
+import msgpack
+import orjson
+from storage.minio_client import (
+    MINIO_BUCKET,
+    upload_compressed,
+    download_decompressed,
+    delete,
+    delete_many,
+    list_objects,
+)
 from logs.logger import log_error
 from models.requirement import Requirement
+from utils.exceptions import StorageError
+
+# Serialization format for contexts stored in Minio: "msgpack" (compact binary, default)
+# or "json" (human-readable, useful for debugging or rolling back).
+CONTEXT_FORMAT: str = os.getenv("CONTEXT_FORMAT", "msgpack").lower()
+
+# Object file extension and content type for each supported context format
+_CONTEXT_FORMATS: dict[str, tuple[str, str]] = {
+    "msgpack": ("msgpack", "application/x-msgpack"),
+    "json": ("json", "application/json"),
+}
+if CONTEXT_FORMAT not in _CONTEXT_FORMATS:
+    raise StorageError(f"Unsupported CONTEXT_FORMAT: {CONTEXT_FORMAT}. Must be 'msgpack' or 'json'.")
+_CONTEXT_EXTENSION, _CONTEXT_CONTENT_TYPE = _CONTEXT_FORMATS[CONTEXT_FORMAT]
 
 # In-memory state management for active pipeline runs.
 # Stores chat_id -> run_id mapping for quick access.
@@ -14,15 +44,67 @@ from models.requirement import Requirement
 pipeline_runs: dict[int, str] = {}
 
 # In-memory storage for step retry counts.
-# Stores chat_id -> step_name -> retry_count.
+# Stores (chat_id, step_name) -> retry_count; missing keys count as 0.
 # This helps in implementing exponential backoff for failed steps.
 # In a production environment, this should also be replaced with a persistent storage.
-step_retry_counts: dict[int, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+step_retry_counts: Counter[tuple[int, str]] = Counter()
+
+# Per-chat locks that serialize step execution.
+# Stores chat_id -> asyncio.Lock so a double-clicked "Run" button can't run the same step twice.
+chat_locks: dict[int, asyncio.Lock] = {}
+
+# Process-local write-through cache of pipeline contexts.
+# Stores run_id -> encoded context (as last saved, before compression), so consecutive steps of a run
+# don't re-download and decompress it from Minio. Each load decodes a fresh dictionary, so a step that
+# mutates the context and then fails can't leak its partial changes into the next retry.
+# Every save still writes to Minio, so Minio remains the source of truth. The least recently used
+# runs are evicted beyond CONTEXT_CACHE_MAXSIZE, so abandoned runs don't accumulate in memory.
+CONTEXT_CACHE_MAXSIZE = 64
+_ctx_cache: OrderedDict[str, bytes] = OrderedDict()
+_ctx_cache_lock = threading.Lock()
+
+# Field names of Requirement, resolved once for serialization (slotted instances have no __dict__).
+_REQUIREMENT_FIELDS: tuple[str, ...] = tuple(f.name for f in fields(Requirement))
+
+# Prefix and suffix of context object paths, built once instead of on every save/load.
+# The format extension plus '.zst' suffix identify how the object was encoded.
+_CONTEXT_PREFIX = "contexts/"
+_CONTEXT_SUFFIX = "/context." + _CONTEXT_EXTENSION + ".zst"
+
+# Contexts not updated for this many hours are considered abandoned and removed by the periodic cleanup.
+CONTEXT_TTL_HOURS: float = float(os.getenv("CONTEXT_TTL_HOURS", "24"))
+
+def clear_step_retry_counts(chat_id: int) -> None:
+    """
+    Removes the retry counts of all steps for a chat, e.g. when its pipeline is cancelled or closed.
+
+    Args:
+        chat_id (int): The Telegram chat ID whose retry counts should be cleared.
+    """
+    for key in [key for key in step_retry_counts if key[0] == chat_id]:
+        del step_retry_counts[key]
+
+
+def discard_chat_lock(chat_id: int) -> None:
+    """
+    Removes the step lock of a chat, e.g. when its pipeline is cancelled or closed. A lock that is
+    still held by a running step is kept: removing it would let the next button press create a new
+    lock and run a step concurrently with the one still in progress.
 
+    Args:
+        chat_id (int): The Telegram chat ID whose lock should be removed.
+    """
+    lock = chat_locks.get(chat_id)
+    if lock is not None and not lock.locked():
+        del chat_locks[chat_id]
+
+
+@lru_cache(maxsize=1024)
 def get_context_minio_path(run_id: str) -> str:
     """
     Constructs the Minio object path for a given pipeline run's context file.
-    The context files are stored under a 'contexts/{run_id}/context.json' structure.
+    The context files are stored under a 'contexts/{run_id}/context.<format>.zst' structure,
+    where <format> is 'msgpack' or 'json' depending on CONTEXT_FORMAT.
 
     Args:
         run_id (str): The unique identifier of the pipeline run.
@@ -30,12 +112,77 @@ def get_context_minio_path(run_id: str) -> str:
     Returns:
         str: The full path where the context file is expected to be stored in Minio.
     """
-    return f"contexts/{run_id}/context.json"
+    return _CONTEXT_PREFIX + run_id + _CONTEXT_SUFFIX
+
+
+def _cache_context(run_id: str, payload: bytes) -> None:
+    """
+    Stores the encoded context of a run in the in-memory cache, evicting the least recently
+    used runs when the cache is full.
+
+    Args:
+        run_id (str): The unique identifier of the pipeline run.
+        payload (bytes): The encoded (uncompressed) context.
+    """
+    with _ctx_cache_lock:
+        _ctx_cache[run_id] = payload
+        _ctx_cache.move_to_end(run_id)
+        while len(_ctx_cache) > CONTEXT_CACHE_MAXSIZE:
+            _ctx_cache.popitem(last=False)
+
+
+def _get_cached_context(run_id: str) -> Optional[bytes]:
+    """
+    Looks up the encoded context of a run in the in-memory cache.
+
+    Args:
+        run_id (str): The unique identifier of the pipeline run.
+
+    Returns:
+        Optional[bytes]: The encoded context, or None if the run is not cached.
+    """
+    with _ctx_cache_lock:
+        payload = _ctx_cache.get(run_id)
+        if payload is not None:
+            _ctx_cache.move_to_end(run_id)
+        return payload
+
+
+def _evict_cached_context(run_id: str) -> None:
+    """
+    Removes a run from the in-memory context cache, if present.
+
+    Args:
+        run_id (str): The unique identifier of the pipeline run.
+    """
+    with _ctx_cache_lock:
+        _ctx_cache.pop(run_id, None)
+
+
+def _encode_requirement(obj: object) -> dict:
+    """
+    Serialization hook that converts 'Requirement' objects to dictionaries while encoding a context,
+    so the context itself doesn't need to be copied before saving.
+
+    Args:
+        obj (object): An object the serializer can't encode natively.
+
+    Returns:
+        dict: The field values of the Requirement, keyed by field name.
+
+    Raises:
+        TypeError: If the object is not a Requirement.
+    """
+    if isinstance(obj, Requirement):
+        return {name: getattr(obj, name) for name in _REQUIREMENT_FIELDS}
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
 
 
 def save_context_to_minio(ctx: dict) -> None:
     """
-    Saves the pipeline context dictionary to Minio as a JSON file.
+    Saves the pipeline context dictionary to Minio, encoded according to CONTEXT_FORMAT
+    and compressed with Zstandard. The encoded context is also kept in the in-memory cache
+    so the next load for this run doesn't need a Minio round trip.
     This function handles the serialization of 'Requirement' objects within the context
     to a dictionary format before saving.
 
@@ -43,18 +190,21 @@ def save_context_to_minio(ctx: dict) -> None:
         ctx (dict): The pipeline context dictionary to be saved.
     """
     run_id = ctx["run_id"]
-    serializable_ctx = ctx.copy()
-    # If the context contains Requirement objects, convert them to dictionaries for serialization
-    if "requirements" in serializable_ctx and isinstance(serializable_ctx["requirements"], list):
-        serializable_ctx["requirements"] = [req.__dict__ for req in serializable_ctx["requirements"]]
-    upload_json(os.getenv("MINIO_BUCKET"), get_context_minio_path(run_id), serializable_ctx)
+    # Requirement objects are converted to dictionaries by the encoder hook during serialization
+    if CONTEXT_FORMAT == "msgpack":
+        payload = msgpack.packb(ctx, default=_encode_requirement, use_bin_type=True)
+    else:
+        payload = orjson.dumps(ctx, default=_encode_requirement)
+    upload_compressed(MINIO_BUCKET, get_context_minio_path(run_id), payload, content_type=_CONTEXT_CONTENT_TYPE)
+    _cache_context(run_id, payload)
 
 
 def load_context_from_minio(run_id: str) -> dict:
     """
     Loads the pipeline context dictionary from Minio and reconstructs 'Requirement' objects.
-    This function retrieves the JSON context file from Minio and converts any dictionary
-    representations of requirements back into `Requirement` objects.
+    Contexts held in the in-memory cache are decoded from their cached encoding. Otherwise, this function retrieves the compressed context file from Minio and decompresses it.
+    The context is decoded according to CONTEXT_FORMAT, and any dictionary representations of requirements are converted back into `Requirement` objects.
+    Every call returns a new dictionary, so callers may mutate it freely.
 
     Args:
         run_id (str): The unique identifier of the pipeline run.
@@ -62,7 +212,15 @@ def load_context_from_minio(run_id: str) -> dict:
     Returns:
         dict: The loaded pipeline context dictionary with 'Requirement' objects reconstructed.
     """
-    loaded_ctx = download_json(os.getenv("MINIO_BUCKET"), get_context_minio_path(run_id))
+    payload = _get_cached_context(run_id)
+    if payload is None:
+        payload = download_decompressed(MINIO_BUCKET, get_context_minio_path(run_id))
+        _cache_context(run_id, payload)
+
+    if CONTEXT_FORMAT == "msgpack":
+        loaded_ctx = msgpack.unpackb(payload, raw=False)
+    else:
+        loaded_ctx = orjson.loads(payload)
     # If the loaded context contains dictionaries for requirements, convert them back to Requirement objects
     if "requirements" in loaded_ctx and isinstance(loaded_ctx["requirements"], list):
         loaded_ctx["requirements"] = [Requirement(**req_dict) for req_dict in loaded_ctx["requirements"]]
@@ -72,16 +230,40 @@ def load_context_from_minio(run_id: str) -> dict:
 def delete_context_from_minio(run_id: str) -> None:
     """
     Deletes the pipeline context file associated with a specific run_id from Minio.
-
-    Note: The actual implementation for deleting the object from Minio is currently
-    a placeholder and needs to be added.
+    Failures are logged rather than raised, since the run is being discarded anyway.
 
     Args:
         run_id (str): The unique identifier of the pipeline run whose context needs to be deleted.
     """
+    # Drop the cached copy so a finished or cancelled run can't be resumed from memory
+    _evict_cached_context(run_id)
     try:
-        # TODO: Implement actual deletion of the context file from Minio.
-        # This would typically involve calling a Minio client method to remove the object.
-        pass
-    except Exception as e:
+        delete(MINIO_BUCKET, get_context_minio_path(run_id))
+    except StorageError as e:
         log_error(f"Failed to delete context for run_id {run_id} from MinIO: {e}")
+
+
+def cleanup_stale_contexts() -> int:
+    """
+    Removes context files of runs that have not been updated for CONTEXT_TTL_HOURS
+    (e.g., runs abandoned without being closed or cancelled), deleting them in one batched request.
+    Contexts of runs that are still active in this process are always kept.
+
+    Returns:
+        int: The number of context files deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=CONTEXT_TTL_HOURS)
+    active_paths = {get_context_minio_path(run_id) for run_id in pipeline_runs.values()}
+    try:
+        stale_paths = [
+            path for path, last_modified in list_objects(MINIO_BUCKET, _CONTEXT_PREFIX)
+            if last_modified < cutoff and path not in active_paths
+        ]
+        delete_many(MINIO_BUCKET, stale_paths)
+    except StorageError as e:
+        log_error(f"Failed to clean up stale contexts in MinIO: {e}")
+        return 0
+    # Stale runs must not be resumed from the in-memory cache either
+    for path in stale_paths:
+        _evict_cached_context(path[len(_CONTEXT_PREFIX):-len(_CONTEXT_SUFFIX)])
+    return len(stale_paths)
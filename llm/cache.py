@@ -0,0 +1,143 @@
+"""
+This module provides a persistent on-disk cache for LLM responses. The prompts of the
+pipeline steps are a deterministic function of their input artifacts, so re-running the
+pipeline on unchanged inputs can reuse the earlier responses instead of paying for the
+LLM calls again. Only deterministic calls (temperature 0) are cached unless
+LLM_CACHE_ENABLED=true, and a response is only stored
+once the caller has validated it, so a bad answer is never replayed.
+"""
+import hashlib
+import os
+import threading
+from typing import Callable, Optional
+from llm.llm_client import LLM_CACHE_ENABLED, call_llm
+from logs.logger import log_error
+
+# Directory of the cached responses, one text file per prompt.
+# Set QA_LLM_NO_CACHE=1 to always call the LLM.
+LLM_CACHE_DIR = os.path.join("artifacts", ".llm_cache")
+QA_LLM_NO_CACHE: bool = os.getenv("QA_LLM_NO_CACHE", "0") == "1"
+
+def is_cacheable(temperature: float) -> bool:
+    """
+    Tells whether the responses of LLM calls at a temperature may be cached: calls at temperature 0
+    are deterministic, others are only cached when LLM_CACHE_ENABLED opts in (otherwise a rerun,
+    e.g. the bot's Retry button, is expected to get a fresh response).
+
+    Args:
+        temperature (float): The generation temperature.
+
+    Returns:
+        bool: True if responses may be read from and written to the cache.
+    """
+    return not QA_LLM_NO_CACHE and (temperature == 0 or LLM_CACHE_ENABLED)
+
+def _cache_key(model_name: str, temperature: float, prompt: str, system_prompt: Optional[str]) -> str:
+    """
+    Computes the cache key of an LLM call: the BLAKE2b hash of everything that determines the response.
+
+    Args:
+        model_name (str): The name of the LLM model.
+        temperature (float): The generation temperature.
+        prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): The static system prompt, if any.
+
+    Returns:
+        str: The hex digest used as the cache file name.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model_name, repr(round(temperature, 2)), system_prompt or "", prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0") # Separator, so the boundaries between parts are unambiguous
+    return digest.hexdigest()
+
+def _cache_file(model_name: str, temperature: float, prompt: str, system_prompt: Optional[str]) -> str:
+    """
+    Returns the path of the cache entry of an LLM call.
+
+    Args:
+        model_name (str): The name of the LLM model.
+        temperature (float): The generation temperature.
+        prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): The static system prompt, if any.
+
+    Returns:
+        str: The path of the cache file (which may not exist).
+    """
+    return os.path.join(LLM_CACHE_DIR, f"{_cache_key(model_name, temperature, prompt, system_prompt)}.txt")
+
+def load_cached_response(model_name: str, temperature: float, prompt: str,
+                         system_prompt: Optional[str] = None) -> Optional[str]:
+    """
+    Looks up the cached response of an LLM call.
+
+    Args:
+        model_name (str): The name of the LLM model.
+        temperature (float): The generation temperature.
+        prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): The static system prompt, if any. Defaults to None.
+
+    Returns:
+        Optional[str]: The cached response, or None on a cache miss (or when the call is not cacheable).
+    """
+    if not is_cacheable(temperature):
+        return None
+    try:
+        with open(_cache_file(model_name, temperature, prompt, system_prompt), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None # Cache miss (or unreadable entry)
+
+def store_cached_response(response: str, model_name: str, temperature: float, prompt: str,
+                          system_prompt: Optional[str] = None) -> None:
+    """
+    Stores the response of an LLM call in the cache. Callers only store responses they have
+    validated. The entry is written to a temporary file and renamed into place, so concurrent
+    runs never read a partially written entry. Empty responses are not cached.
+
+    Args:
+        response (str): The LLM response to cache.
+        model_name (str): The name of the LLM model.
+        temperature (float): The generation temperature.
+        prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): The static system prompt, if any. Defaults to None.
+    """
+    if not is_cacheable(temperature) or not response:
+        return
+    cache_file = _cache_file(model_name, temperature, prompt, system_prompt)
+    temp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(response)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        log_error(f"Failed to cache LLM response: {e}")
+
+def cached_call_llm(model_name: str, temperature: float, prompt: str, system_prompt: Optional[str] = None,
+                    validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Calls the LLM like `call_llm`, but serves identical cacheable calls from the on-disk response
+    cache. A new response is cached only if `validate` accepts it.
+
+    Args:
+        model_name (str): The name of the LLM model to use.
+        temperature (float): The generation temperature.
+        prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): Static instructions shared across calls. Defaults to None.
+        validate (Optional[Callable[[str], bool]]): Returns True for a response the caller can use.
+                                                    Without it, new responses are not cached. Defaults to None.
+
+    Returns:
+        str: The generated (or cached) text content.
+
+    Raises:
+        LLMError: If the LLM call fails for any reason.
+    """
+    cached = load_cached_response(model_name, temperature, prompt, system_prompt)
+    if cached is not None:
+        return cached
+    response = call_llm(model_name=model_name, temperature=temperature, prompt=prompt, system_prompt=system_prompt)
+    if validate is not None and validate(response):
+        store_cached_response(response, model_name, temperature, prompt, system_prompt)
+    return response
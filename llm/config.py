@@ -0,0 +1,30 @@
+"""
+This module resolves the LLM model and generation settings of the pipeline steps from
+environment variables. The environment is fixed for the process lifetime, so each step
+loads its settings once at import instead of on every run.
+"""
+import os
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class LLMConfig:
+    """The LLM settings used by a pipeline step."""
+    model_name: str
+    temperature: float
+
+def load_llm_config(default_temperature: float) -> LLMConfig:
+    """
+    Reads the LLM settings from the environment: the model of the configured provider
+    (LLM_PROVIDER) and the generation temperature (GEMINI_TEMPERATURE).
+
+    Args:
+        default_temperature (float): The temperature used when GEMINI_TEMPERATURE is not set.
+
+    Returns:
+        LLMConfig: The resolved model name and temperature.
+    """
+    if os.getenv("LLM_PROVIDER", "cloud") == "cloud":
+        model_name = os.getenv("CLOUD_MODEL_NAME", "gemini-pro")
+    else:  # local
+        model_name = os.getenv("LOCAL_MODEL_NAME", "llama2")
+    return LLMConfig(model_name=model_name, temperature=float(os.getenv("GEMINI_TEMPERATURE", str(default_temperature))))
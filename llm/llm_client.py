@@ -2,13 +2,64 @@
 This module provides a unified client for interacting with different Large Language Model (LLM) providers,
 supporting both cloud-based (Google Gemini) and local LLMs. It abstracts the underlying API calls
 to provide a consistent interface for generating content.
+
+The provider SDKs (google-genai, httpx) are heavy, so they are imported only when the
+corresponding client is first used rather than when this module is imported.
 """
+from __future__ import annotations
+
 import os
-from google import genai
-import requests
+import orjson
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
 from utils.exceptions import LLMError
 from abc import ABC, abstractmethod # Import ABC and abstractmethod
 
+if TYPE_CHECKING:
+    from google.genai import types
+
+# Connection pool limits for the local LLM HTTP client
+LOCAL_LLM_MAX_CONNECTIONS = 32
+LOCAL_LLM_MAX_KEEPALIVE_CONNECTIONS = 16
+# Automatic retries for connection failures against the local LLM endpoint
+LOCAL_LLM_MAX_RETRIES = 3
+# Request timeout in seconds; local models can take a while to produce long answers
+LOCAL_LLM_TIMEOUT = 120.0
+# Request headers for the local LLM chat endpoint
+LOCAL_LLM_HEADERS = {"Content-Type": "application/json"}
+
+# Response cache of llm.cache. Calls with temperature 0 are always cached (they are deterministic);
+# set LLM_CACHE_ENABLED=true to also cache calls at non-zero temperatures.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+
+# Maximum number of LLM requests started per minute across all threads, to stay within the
+# provider's rate limit when steps issue concurrent calls. 0 disables the limit.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+_rate_limit_lock = threading.Lock()
+_next_request_at = 0.0 # Monotonic time at which the next request may start
+
+# Lightweight response types that mirror the shape of a Gemini response
+# (response.candidates[0].content.parts[0].text) for local LLM results.
+@dataclass(slots=True)
+class _Part:
+    text: str
+
+@dataclass(slots=True)
+class _Content:
+    parts: list[_Part]
+
+@dataclass(slots=True)
+class _Candidate:
+    content: _Content
+
+@dataclass(slots=True)
+class _Response:
+    candidates: list[_Candidate]
+
 # Abstract LLM Client Interface
 class AbstractLLMClient(ABC):
     """
@@ -23,22 +74,57 @@ class AbstractLLMClient(ABC):
         Args:
             model_name (str): The name of the LLM model to use.
             contents (list): A list of content parts to send to the LLM (e.g., prompts).
-            generation_config (dict): Configuration for content generation, such as temperature.
+            generation_config (dict): Configuration for content generation, such as temperature
+                                      and an optional 'system_instruction'.
         """
         pass
 
+    @abstractmethod
+    def generate_content_stream(self, model_name: str, contents: list, generation_config: dict) -> Iterator[str]:
+        """
+        Generates content using the specified LLM, yielding text chunks as they are produced.
+
+        Args:
+            model_name (str): The name of the LLM model to use.
+            contents (list): A list of content parts to send to the LLM (e.g., prompts).
+            generation_config (dict): Configuration for content generation, such as temperature
+                                      and an optional 'system_instruction'.
+
+        Yields:
+            str: The next chunk of generated text.
+        """
+        pass
+
+@lru_cache(maxsize=16)
+def _gemini_config(temperature: float, system_instruction: Optional[str] = None) -> types.GenerateContentConfig:
+    """
+    Returns the Gemini generation config for a temperature and system instruction. Configs are cached
+    because each pipeline step uses a fixed temperature and static system prompt, so only a handful
+    of distinct ones exist.
+
+    Args:
+        temperature (float): The generation temperature.
+        system_instruction (Optional[str]): The static system prompt, if any. Defaults to None.
+
+    Returns:
+        types.GenerateContentConfig: The generation config for the Gemini API.
+    """
+    from google.genai import types
+    return types.GenerateContentConfig(temperature=temperature, system_instruction=system_instruction)
+
 class CloudLLMClient(AbstractLLMClient):
     """
     LLM client for interacting with cloud-based Google Gemini models.
     """
     def __init__(self, api_key: str):
         """
-        Initializes the CloudLLMClient with the Google Gemini API key.
+        Initializes the CloudLLMClient with a Google Gemini API client.
 
         Args:
             api_key (str): The API key for Google Gemini.
         """
-        genai.configure(api_key=api_key)
+        from google import genai
+        self._client = genai.Client(api_key=api_key)
 
     def generate_content(self, model_name: str, contents: list, generation_config: dict):
         """
@@ -47,19 +133,43 @@ class CloudLLMClient(AbstractLLMClient):
         Args:
             model_name (str): The name of the Gemini model to use (e.g., 'gemini-pro').
             contents (list): A list of content parts (prompts).
-            generation_config (dict): Configuration for generation, typically including 'temperature'.
+            generation_config (dict): Configuration for generation, typically including 'temperature'
+                                      and optionally 'system_instruction'.
 
         Returns:
-            GenerativeModelResponse: The response object from the Gemini API.
+            types.GenerateContentResponse: The response object from the Gemini API.
         """
-        model = genai.GenerativeModel(model_name)
-        # Assuming temperature is the only config for now that needs to be explicitly passed
-        temp_config = genai.GenerationConfig(temperature=generation_config.get("temperature", 0.7))
-        response = model.generate_content(
+        # Temperature and the optional system instruction are the only configs passed for now
+        return self._client.models.generate_content(
+            model=model_name,
             contents=contents,
-            generation_config=temp_config
+            config=_gemini_config(
+                generation_config.get("temperature", 0.7), generation_config.get("system_instruction")
+            )
         )
-        return response
+
+    def generate_content_stream(self, model_name: str, contents: list, generation_config: dict) -> Iterator[str]:
+        """
+        Generates content using a cloud-based Google Gemini model, streaming the response.
+
+        Args:
+            model_name (str): The name of the Gemini model to use (e.g., 'gemini-pro').
+            contents (list): A list of content parts (prompts).
+            generation_config (dict): Configuration for generation, typically including 'temperature'
+                                      and optionally 'system_instruction'.
+
+        Yields:
+            str: The next chunk of generated text.
+        """
+        for chunk in self._client.models.generate_content_stream(
+            model=model_name,
+            contents=contents,
+            config=_gemini_config(
+                generation_config.get("temperature", 0.7), generation_config.get("system_instruction")
+            )
+        ):
+            if chunk.text:
+                yield chunk.text
 
 class LocalLLMClient(AbstractLLMClient):
     """
@@ -67,12 +177,27 @@ class LocalLLMClient(AbstractLLMClient):
     """
     def __init__(self, endpoint: str):
         """
-        Initializes the LocalLLMClient with the local LLM endpoint URL.
+        Initializes the LocalLLMClient with the local LLM endpoint URL and a pooled HTTP client.
+        Connections are kept alive and reused across calls, and HTTP/2 lets concurrent requests
+        share one connection when the endpoint (or its reverse proxy) supports it.
 
         Args:
             endpoint (str): The URL of the local LLM API endpoint.
         """
         self.endpoint = endpoint
+        import httpx
+        # Pool limits and HTTP/2 are set on the transport, which takes precedence over client-level options
+        self._http = httpx.Client(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=LOCAL_LLM_MAX_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=LOCAL_LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LOCAL_LLM_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            ),
+            timeout=LOCAL_LLM_TIMEOUT,
+        )
 
     def generate_content(self, model_name: str, contents: list, generation_config: dict):
         """
@@ -81,37 +206,97 @@ class LocalLLMClient(AbstractLLMClient):
         Args:
             model_name (str): The name of the local LLM model to use.
             contents (list): A list of content parts (prompts).
-            generation_config (dict): Configuration for generation, typically including 'temperature'.
+            generation_config (dict): Configuration for generation, typically including 'temperature'
+                                      and optionally 'system_instruction'.
 
         Returns:
-            object: A mocked response object structured similarly to the Gemini API response
-                    to maintain compatibility.
+            _Response: A response object structured like the Gemini API response
+                       to maintain compatibility.
 
         Raises:
             LLMError: If the local LLM API call fails.
         """
+        import httpx
         try:
-            headers = {"Content-Type": "application/json"}
-            data = {
-                "model": model_name,
-                "messages": [{"role": "user", "content": contents[0]}],
-                "temperature": generation_config.get("temperature", 0.7),
-                "stream": False
-            }
-            response = requests.post(f"{self.endpoint}/api/chat", headers=headers, json=data)
+            response = self._http.post(
+                f"{self.endpoint}/api/chat",
+                headers=LOCAL_LLM_HEADERS,
+                json=self._chat_request(model_name, contents, generation_config, stream=False)
+            )
             response.raise_for_status()
             json_response = response.json()
-            # Reconstruct a similar response object structure to mimic genai.GenerativeModelResponse
-            return type('obj', (object,), {
-                'candidates': [type('obj', (object,), {
-                    'content': type('obj', (object,), {
-                        'parts': [type('obj', (object,), {'text': json_response['message']['content']})]
-                    })
-                })
-            ]
-            })()
-        except requests.exceptions.RequestException as e:
-            raise LLMError(f"Local LLM API call failed: {e}") from e
+            # Build a response with the same structure as a Gemini response
+            return _Response(candidates=[
+                _Candidate(content=_Content(parts=[_Part(text=json_response['message']['content'])]))
+            ])
+        except httpx.HTTPError as e:
+            raise LLMError(f"Local LLM API call failed: {e}", status_code=_status_code(e)) from e
+
+    def generate_content_stream(self, model_name: str, contents: list, generation_config: dict) -> Iterator[str]:
+        """
+        Generates content using a local LLM, streaming the response. The endpoint returns
+        newline-delimited JSON objects, each carrying the next piece of the message.
+
+        Args:
+            model_name (str): The name of the local LLM model to use.
+            contents (list): A list of content parts (prompts).
+            generation_config (dict): Configuration for generation, typically including 'temperature'
+                                      and optionally 'system_instruction'.
+
+        Yields:
+            str: The next chunk of generated text.
+
+        Raises:
+            LLMError: If the local LLM API call fails.
+        """
+        import httpx
+        try:
+            with self._http.stream(
+                "POST",
+                f"{self.endpoint}/api/chat",
+                headers=LOCAL_LLM_HEADERS,
+                json=self._chat_request(model_name, contents, generation_config, stream=True)
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    text = chunk.get("message", {}).get("content")
+                    if text:
+                        yield text
+                    if chunk.get("done"):
+                        break
+        except httpx.HTTPError as e:
+            raise LLMError(f"Local LLM API call failed: {e}", status_code=_status_code(e)) from e
+
+    @staticmethod
+    def _chat_request(model_name: str, contents: list, generation_config: dict, stream: bool) -> dict:
+        """
+        Builds the JSON body of a chat request to the local LLM endpoint.
+
+        Args:
+            model_name (str): The name of the local LLM model to use.
+            contents (list): A list of content parts (prompts); the first one is sent as the user message.
+                             A 'system_instruction' in the generation config is sent as a leading
+                             system message, so the server can reuse its cached prefix across calls.
+            generation_config (dict): Configuration for generation, typically including 'temperature'
+                                      and optionally 'system_instruction'.
+            stream (bool): Whether the endpoint should stream the response.
+
+        Returns:
+            dict: The request body.
+        """
+        messages = [{"role": "user", "content": contents[0]}]
+        system_instruction = generation_config.get("system_instruction")
+        if system_instruction:
+            messages.insert(0, {"role": "system", "content": system_instruction})
+        return {
+            "model": model_name,
+            "messages": messages,
+            "temperature": generation_config.get("temperature", 0.7),
+            "stream": stream
+        }
 
 def get_llm_client() -> AbstractLLMClient:
     """
@@ -138,17 +323,85 @@ def get_llm_client() -> AbstractLLMClient:
     else:
         raise LLMError(f"Unsupported LLM_PROVIDER: {llm_provider}. Must be 'cloud' or 'local'.")
 
-# Global client instance obtained at module import time
-client = get_llm_client()
+@lru_cache(maxsize=1)
+def get_client() -> AbstractLLMClient:
+    """
+    Returns the process-wide LLM client, creating it on first use.
+    Creating it lazily keeps importing this module cheap (e.g., for bot commands that never call the LLM),
+    and tests can reset it with `get_client.cache_clear()`.
+
+    Returns:
+        AbstractLLMClient: The shared LLM client instance.
+
+    Raises:
+        LLMError: If the client can't be created from the environment configuration.
+    """
+    return get_llm_client()
+
+def _generation_config(temperature: float, system_prompt: Optional[str]) -> dict:
+    """
+    Builds the provider-neutral generation config passed to the LLM clients.
+
+    Args:
+        temperature (float): The generation temperature.
+        system_prompt (Optional[str]): The static system prompt, if any.
+
+    Returns:
+        dict: The generation config.
+    """
+    if system_prompt is None:
+        return {"temperature": temperature}
+    return {"temperature": temperature, "system_instruction": system_prompt}
+
+def _wait_for_rate_limit() -> None:
+    """
+    Blocks until the next LLM request may start under LLM_REQUESTS_PER_MINUTE. Requests are
+    spaced evenly; each caller reserves its start slot under the lock and sleeps outside it,
+    so concurrent callers queue up without holding the lock.
+    """
+    global _next_request_at
+    if LLM_REQUESTS_PER_MINUTE <= 0:
+        return
+    with _rate_limit_lock:
+        now = time.monotonic()
+        start_at = max(now, _next_request_at)
+        _next_request_at = start_at + 60.0 / LLM_REQUESTS_PER_MINUTE
+    if start_at > now:
+        time.sleep(start_at - now)
+
+def _status_code(error: Exception) -> Optional[int]:
+    """
+    Returns the HTTP status code carried by an LLM provider error, if any.
+
+    Args:
+        error (Exception): The exception raised by the provider client.
+
+    Returns:
+        Optional[int]: The HTTP status code, or None if the error has none (e.g., a connection failure).
+    """
+    if isinstance(error, LLMError):
+        return error.status_code
+    # httpx.HTTPStatusError carries the failed response; google-genai's APIError carries the status as `code`
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return status if isinstance(status, int) else None
 
-def call_llm(model_name: str, temperature: float, prompt: str) -> str:
+def call_llm(model_name: str, temperature: float, prompt: str, system_prompt: Optional[str] = None) -> str:
     """
     Calls the configured LLM client to generate content based on a prompt.
+    Every call reaches the provider; steps that reuse responses go through `llm.cache`,
+    which only stores responses they validated, so a retry never replays a bad answer.
+
+    A static `system_prompt` is sent separately from the per-call `prompt` (as a Gemini system
+    instruction or a leading system message), so repeated calls share an identical prefix that
+    providers can serve from their prompt cache.
 
     Args:
         model_name (str): The name of the LLM model to use (e.g., 'gemini-pro', 'codegemma:7b').
         temperature (float): The generation temperature to control creativity (0.0 to 1.0).
         prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): Static instructions shared across calls. Defaults to None.
 
     Returns:
         str: The generated text content from the LLM.
@@ -156,14 +409,46 @@ def call_llm(model_name: str, temperature: float, prompt: str) -> str:
     Raises:
         LLMError: If the LLM call fails for any reason.
     """
+    _wait_for_rate_limit()
     try:
-        response = client.generate_content(
+        # The provider is fixed for the process lifetime, so the cached client is reused for every call
+        response = get_client().generate_content(
             model_name=model_name,
             contents=[prompt],
-            generation_config={"temperature": temperature}
+            generation_config=_generation_config(temperature, system_prompt)
         )
         # Extract and return the generated text from the response
         return response.candidates[0].content.parts[0].text.strip()
     except Exception as e:
-        raise LLMError(f"Failed to call LLM: {e}") from e
+        raise LLMError(f"Failed to call LLM: {e}", status_code=_status_code(e)) from e
+
+def call_llm_stream(model_name: str, temperature: float, prompt: str,
+                    system_prompt: Optional[str] = None) -> Iterator[str]:
+    """
+    Calls the configured LLM client and yields the generated text in chunks as they arrive,
+    so callers can start processing (or validating) the output before generation finishes.
+    Streamed responses bypass the response cache.
+
+    Args:
+        model_name (str): The name of the LLM model to use (e.g., 'gemini-pro', 'codegemma:7b').
+        temperature (float): The generation temperature to control creativity (0.0 to 1.0).
+        prompt (str): The input prompt for the LLM.
+        system_prompt (Optional[str]): Static instructions shared across calls. Defaults to None.
 
+    Yields:
+        str: The next chunk of generated text.
+
+    Raises:
+        LLMError: If the LLM call fails for any reason.
+    """
+    _wait_for_rate_limit()
+    try:
+        yield from get_client().generate_content_stream(
+            model_name=model_name,
+            contents=[prompt],
+            generation_config=_generation_config(temperature, system_prompt)
+        )
+    except LLMError:
+        raise
+    except Exception as e:
+        raise LLMError(f"Failed to call LLM: {e}", status_code=_status_code(e)) from e
@@ -57,4 +57,25 @@ If an **issue is found**, return a STRICT JSON object representing a bug report,
 
 **AUTOTESTS (provided for analysis):**
 {tests}
-'''
\ No newline at end of file
+'''
+
+# The prompt split once at import into the literal text around its placeholders, with the '{{'/'}}'
+# escapes resolved, so rendering is a plain join instead of re-parsing the template on every call.
+# Unpacking fails at import if a placeholder is missing or duplicated.
+_HEAD, _REST = PROMPT.split("{testcases}")
+_MIDDLE, _TAIL = _REST.split("{tests}")
+_PROMPT_PARTS = tuple(part.replace("{{", "{").replace("}}", "}") for part in (_HEAD, _MIDDLE, _TAIL))
+
+
+def render(testcases: str, tests: str) -> str:
+    """
+    Renders the bug report prompt; equivalent to `PROMPT.format(testcases=..., tests=...)`.
+
+    Args:
+        testcases (str): The test cases (JSON) to analyze.
+        tests (str): The source code of the generated autotests.
+
+    Returns:
+        str: The complete prompt text.
+    """
+    return "".join((_PROMPT_PARTS[0], testcases, _PROMPT_PARTS[1], tests, _PROMPT_PARTS[2]))
@@ -2,32 +2,42 @@
 This module defines the Large Language Model (LLM) prompt used for performing code reviews
 on auto-generated Python + Pytest tests. The prompt instructs the LLM to act as a Senior QA Automation Architect,
 focusing on specific quality aspects and outputting a structured JSON review.
+
+The prompt is split into a static SYSTEM_PROMPT, identical for every review request, and a small
+FILE_TEMPLATE carrying the code of each reviewed file, so providers can cache the shared instructions.
+One request may contain several files; the LLM returns one review per file.
 """
 
-PROMPT = '''
+SYSTEM_PROMPT = '''
 # Code Review Prompt for LLM
 
-You are a Senior QA Automation Architect. Your task is to perform a strict code review of the
-auto-generated Python + Pytest test provided below.
+You are a Senior QA Automation Architect. Your task is to perform a strict code review of each
+auto-generated Python + Pytest test provided in the user message. Each test is introduced by a
+`### TEST_ID: <test_id>` header followed by its `CODE`.
 
 ## Output Format:
 
-Respond **ONLY** with a valid JSON object containing the following structure:
+Respond **ONLY** with a valid JSON object containing one review per provided test, in the same order:
 ```json
-{{
-  "test_id": "{test_id}",
-  "issues": [
-    {{
-      "category": "functional_risk | test_design | stability | maintainability",
-      "severity": "high | medium | low",
-      "description": "Concise issue description",
-      "suggestion": "Specific improvement suggestion"
-    }}
-  ],
-  "summary": "Overall assessment in one sentence"
-}}
+{
+  "reviews": [
+    {
+      "test_id": "<TEST_ID from the test's header>",
+      "issues": [
+        {
+          "category": "functional_risk | test_design | stability | maintainability",
+          "severity": "high | medium | low",
+          "description": "Concise issue description",
+          "suggestion": "Specific improvement suggestion"
+        }
+      ],
+      "summary": "Overall assessment in one sentence"
+    }
+  ]
+}
 ```
--   If **no issues are found**, set `"issues": []` and write a positive overall summary.
+-   If **no issues are found** in a test, set its `"issues": []` and write a positive overall summary.
+-   Review every test independently; never merge findings of different tests.
 
 ## Analysis Areas:
 
@@ -44,9 +54,31 @@ Analyze the `CODE` and provide insights on:
 -   Focus exclusively on test automation quality.
 -   Output **MUST** be valid JSON.
 -   **NO** markdown, **NO** explanations, **NO** extra text outside the JSON object.
+'''
 
----
+FILE_TEMPLATE = '''
+### TEST_ID: {test_id}
 
 **CODE (provided for review):**
 {code}
-'''
\ No newline at end of file
+'''
+
+# FILE_TEMPLATE split once at import into the literal text around its placeholders, so rendering
+# each file is a plain join. Unpacking fails at import if a placeholder is missing or duplicated.
+_HEAD, _REST = FILE_TEMPLATE.split("{test_id}")
+_MIDDLE, _TAIL = _REST.split("{code}")
+_FILE_TEMPLATE_PARTS = (_HEAD, _MIDDLE, _TAIL)
+
+
+def render(code: str, test_id: str) -> str:
+    """
+    Renders the per-file review prompt; equivalent to `FILE_TEMPLATE.format(code=..., test_id=...)`.
+
+    Args:
+        code (str): The source code of the autotest to review.
+        test_id (str): The ID of the autotest.
+
+    Returns:
+        str: The prompt text for this file.
+    """
+    return "".join((_FILE_TEMPLATE_PARTS[0], test_id, _FILE_TEMPLATE_PARTS[1], code, _FILE_TEMPLATE_PARTS[2]))
@@ -0,0 +1,47 @@
+"""
+This module provides helpers for post-processing raw text responses returned by LLMs,
+shared by the pipeline steps that expect structured (JSON) output.
+"""
+import re
+
+# Markdown code block delimiters around the JSON in LLM responses, compiled once at import
+_LEADING_FENCE = re.compile(r'^```(?:json)?\s*', re.MULTILINE)
+_TRAILING_FENCE = re.compile(r'\s*```$', re.MULTILINE)
+
+def extract_json_from_llm_response(text: str) -> str:
+    """
+    Extracts a JSON string from an LLM's raw text response by removing markdown code block delimiters.
+    The common shape (a single fenced block) is handled with plain prefix/suffix checks; the regexes
+    are only used when the result still doesn't start like a JSON document.
+
+    Args:
+        text (str): The raw text response received from the LLM.
+
+    Returns:
+        str: A clean JSON string, suitable for parsing with `orjson.loads()`.
+    """
+    text = text.strip()
+    # Fast path: strip a surrounding ```json ... ``` block without a regex scan
+    stripped = text.removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    if stripped[:1] in ("{", "["):
+        return stripped
+    # Fallback for unusual layouts (e.g. a fence on a later line)
+    text = _LEADING_FENCE.sub('', text, count=1)
+    return _TRAILING_FENCE.sub('', text, count=1)
+
+def truncate_middle(text: str, max_chars: int) -> str:
+    """
+    Caps a prompt input at `max_chars` characters by cutting out its middle. The beginning and
+    the end are kept, since they usually carry the structure and the final results.
+
+    Args:
+        text (str): The prompt input.
+        max_chars (int): The maximum number of characters kept.
+
+    Returns:
+        str: The text itself if it fits the budget, otherwise its head and tail around a truncation marker.
+    """
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]}\n... [truncated {len(text) - 2 * half} characters] ...\n{text[-half:]}"
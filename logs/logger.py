@@ -1,26 +1,33 @@
 """
 This module sets up a basic logging configuration for the application,
 specifically for error messages. It ensures that error logs are written to a file.
+Records are handed to a background thread through a queue, so logging never blocks the caller on disk I/O.
 """
+import atexit
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 # Define the directory where log files will be stored
 log_dir = "logs"
 # Create the log directory if it doesn't already exist
 os.makedirs(log_dir, exist_ok=True)
 
-# Configure the basic logging settings
-# - level: Only messages of ERROR severity and above will be processed.
-# - format: Defines the layout of log records.
-# - filename: Specifies the file to which log messages will be written.
-# - filemode: 'a' means append mode, so new log messages are added to the end of the file.
-logging.basicConfig(
-    level=logging.ERROR,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    filename=os.path.join(log_dir, "errors.log"),
-    filemode="a"
-)
+# The file handler appends log records to errors.log. It runs in the listener thread,
+# which writes the records put on the queue by the QueueHandler attached to the root logger.
+_file_handler = logging.FileHandler(os.path.join(log_dir, "errors.log"), mode="a")
+_file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+_log_queue: queue.Queue = queue.Queue(-1) # Unbounded, so logging never blocks
+_listener = QueueListener(_log_queue, _file_handler)
+_listener.start()
+# Flush the queued records to the file when the process exits
+atexit.register(_listener.stop)
+
+# Only messages of ERROR severity and above are processed
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.ERROR)
+_root_logger.addHandler(QueueHandler(_log_queue))
 
 def log_error(message: str) -> None:
     """
@@ -5,10 +5,11 @@ with various attributes such as ID, description, priority, and additional detail
 from dataclasses import dataclass, field
 from typing import Optional, Dict, Any
 
-@dataclass
+@dataclass(slots=True)
 class Requirement:
     """
     Represents a single software requirement.
+    Declared with slots, so instances carry no per-object `__dict__`.
 
     Attributes:
         requirement_id (str): A unique identifier for the requirement.
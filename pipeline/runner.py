@@ -1,35 +1,100 @@
 """
 This module defines the AI QA pipeline steps and provides functionality to initialize a pipeline run.
 """
-import uuid
+import importlib
 import os
-from storage.minio_client import download
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Tuple
+from storage.minio_client import MINIO_BUCKET, download, get_etag
 from logs.logger import log_error
-from pipeline.steps import (
-    generate_scenarios,
-
-    generate_testcases,
-    generate_autotests,
-    code_quality_check,
-    ai_code_review,
-    generate_qa_summary,
-    generate_bug_report,
-    run_autotests, pii_scan
+
+
+def _lazy_step(module_name: str) -> Callable[[dict], None]:
+    """
+    Returns the step function of a `pipeline.steps` module without importing the module yet.
+    The module is imported on the first call, so the bot starts without loading the heavy
+    dependencies of every step (e.g., Presidio and spaCy for PII masking).
+
+    Args:
+        module_name (str): The name of the step module in `pipeline.steps`.
+
+    Returns:
+        Callable[[dict], None]: A function that runs the step's `run(ctx)`.
+    """
+    def run(ctx: dict) -> None:
+        # import_module returns the already imported module from sys.modules after the first call
+        importlib.import_module(f"pipeline.steps.{module_name}").run(ctx)
+
+    run.__name__ = run.__qualname__ = f"{module_name}.run"
+    return run
+
+
+# Define the sequence of pipeline steps as two parallel tuples indexed by the step index:
+# the step names and the functions to execute for those steps.
+STEP_NAMES: Tuple[str, ...] = (
+    "PII Masking",
+    "Generating Scenarios",
+    "Generating Test Cases",
+    "Generating Autotests",
+    "Checking Code Quality",
+    "Performing AI Code Review",
+    "Running Autotests",
+    "Generating QA Summary",
+    "Generating Bug Report",
 )
+STEP_FUNCTIONS: Tuple[Callable[[dict], None], ...] = (
+    _lazy_step("pii_scan"),
+    _lazy_step("generate_scenarios"),
+    _lazy_step("generate_testcases"),
+    _lazy_step("generate_autotests"),
+    _lazy_step("code_quality_check"),
+    _lazy_step("ai_code_review"),
+    _lazy_step("run_autotests"),
+    _lazy_step("generate_qa_summary"),
+    _lazy_step("generate_bug_report"),
+)
+assert len(STEP_NAMES) == len(STEP_FUNCTIONS), "Every pipeline step needs a name and a function"
+
+# Set PIPELINE_NO_CACHE=1 to always download the input file when initializing a pipeline
+PIPELINE_NO_CACHE: bool = os.getenv("PIPELINE_NO_CACHE", "0") == "1"
+INPUT_CACHE_TTL_SECONDS = 600
+INPUT_CACHE_MAXSIZE = 32
+# Recently downloaded input files: (file_name, etag) -> (download time, text), oldest first.
+# The ETag is part of the key, so a file re-uploaded with new content is downloaded again.
+_input_cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+
+
+def _download_input(file_name: str) -> str:
+    """
+    Downloads the input file of a pipeline run, reusing a recent download of the same file
+    content (checked by its ETag) so re-runs skip transferring the body.
+
+    Args:
+        file_name (str): The name of the input file in the Minio bucket.
+
+    Returns:
+        str: The content of the input file.
+
+    Raises:
+        StorageError: If the file can't be retrieved from Minio.
+    """
+    if PIPELINE_NO_CACHE:
+        return download(MINIO_BUCKET, file_name)
+
+    key = (file_name, get_etag(MINIO_BUCKET, file_name))
+    now = time.monotonic()
+    cached = _input_cache.get(key)
+    if cached is not None and now - cached[0] < INPUT_CACHE_TTL_SECONDS:
+        return cached[1]
 
-# Define the sequence of pipeline steps
-# Each tuple contains the step name and the function to execute for that step.
-PIPELINE_STEPS = [
-    ("PII Masking", pii_scan.run),
-    ("Generating Scenarios", generate_scenarios.run),
-    ("Generating Test Cases", generate_testcases.run),
-    ("Generating Autotests", generate_autotests.run),
-    ("Checking Code Quality", code_quality_check.run),
-    ("Performing AI Code Review", ai_code_review.run),
-    ("Running Autotests", run_autotests.run),
-    ("Generating QA Summary", generate_qa_summary.run),
-    ("Generating Bug Report", generate_bug_report.run)
-]
+    txt = download(MINIO_BUCKET, file_name)
+    _input_cache[key] = (now, txt)
+    _input_cache.move_to_end(key)
+    while len(_input_cache) > INPUT_CACHE_MAXSIZE:
+        _input_cache.popitem(last=False) # Evict the oldest entry
+    return txt
 
 def initialize_pipeline(file_name: str) -> dict:
     """
@@ -50,8 +115,7 @@ def initialize_pipeline(file_name: str) -> dict:
         Exception: If there is an error downloading the file or initializing the context.
     """
     try:
-        bucket_name = os.getenv("MINIO_BUCKET", "qa-pipeline")
-        txt = download(bucket_name, file_name)
+        txt = _download_input(file_name)
         ctx = {
             "run_id": str(uuid.uuid4()),
             "file_name": file_name,
@@ -4,38 +4,348 @@ It takes auto-generated test code, sends it to an LLM for review based on a spec
 and processes the LLM's response to extract and save structured code review reports.
 """
 import os
-import json
-import re
+import hashlib
+import shutil
+import ijson
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from queue import Queue
+from threading import Thread, get_ident
+from typing import Iterable, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from llm.llm_client import call_llm
-from llm.prompts.code_review import PROMPT
+from llm.config import load_llm_config
+from llm.llm_client import call_llm_stream
+from llm.prompts.code_review import SYSTEM_PROMPT, FILE_TEMPLATE, render as render_file_prompt
+from logs.logger import log_error
 
 load_dotenv()
 
-def _extract_json_from_llm_response(text: str) -> str:
+# Model and temperature of the review calls, resolved once from the environment
+_LLM_CFG = load_llm_config(default_temperature=0.3)
+# Number of autotest files reviewed in a single LLM call
+AI_REVIEW_BATCH_SIZE = max(1, int(os.getenv("AI_REVIEW_BATCH", "8")))
+# Maximum number of review LLM calls in flight at the same time
+AI_REVIEW_CONCURRENCY = max(1, int(os.getenv("AI_REVIEW_CONCURRENCY", "6")))
+# Reviews are cached on disk by the content hash of the reviewed code, the prompt and the model,
+# so unchanged tests are not sent to the LLM again. Set QA_LLM_NO_CACHE=1 to always review.
+REVIEW_CACHE_DIR = os.path.join("artifacts", ".llm_review_cache")
+QA_LLM_NO_CACHE: bool = os.getenv("QA_LLM_NO_CACHE", "0") == "1"
+
+class _FencedJSONStream:
+    """
+    A minimal binary file-like view over streamed LLM text chunks, used as the input of `ijson`.
+    Markdown code block delimiters (```json ... ```) around the JSON are dropped on the fly, and the
+    received text is kept so the raw response can still be saved if parsing fails.
+    """
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._pending = "" # Received text not yet handed to the parser
+        self._started = False # Whether the leading delimiter has been handled
+        self._finished = False
+        self.received: List[str] = []
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Returns the next piece of JSON text; an empty result means the stream is exhausted.
+        `size` is only a hint: whatever has been received so far is returned.
+        """
+        if size == 0: # ijson probes the stream type with read(0)
+            return b""
+        while True:
+            if not self._finished:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    self._finished = True
+                else:
+                    self.received.append(chunk)
+                    self._pending += chunk
+
+            if not self._started:
+                text = self._pending.lstrip()
+                # Wait until enough text has arrived to tell whether it starts with ```json
+                if len(text) < len("```json") and not self._finished:
+                    continue
+                for prefix in ("```json", "```"):
+                    if text.startswith(prefix):
+                        text = text[len(prefix):]
+                        break
+                self._pending = text
+                self._started = True
+
+            if self._finished:
+                # Remove trailing ``` and any whitespace
+                text = self._pending.rstrip()
+                if text.endswith("```"):
+                    text = text[:-3]
+                self._pending = ""
+                return text.encode("utf-8")
+
+            # Hold back trailing backticks and whitespace: they may be the start of the closing delimiter
+            ready = self._pending.rstrip(" \t\r\n`")
+            if ready:
+                self._pending = self._pending[len(ready):]
+                return ready.encode("utf-8")
+
+
+def _test_id(file_path: str) -> str:
+    """
+    Derives the test ID of an autotest from its filename: the name without its extension
+    and without the 'test_' prefix.
+
+    Args:
+        file_path (str): The path to the autotest file.
+
+    Returns:
+        str: The test ID.
+    """
+    name = os.path.basename(file_path)
+    dot = name.rfind(".")
+    if dot > 0: # A leading dot marks a hidden file, not an extension
+        name = name[:dot]
+    return name[5:] if name.startswith("test_") else name
+
+
+def _read_autotest(file_path: str, errors: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    Reads the code of an autotest file.
+
+    Args:
+        file_path (str): The path to the autotest file.
+        errors (List[Tuple[str, str]]): Collects (file or test, reason) pairs of failures.
+
+    Returns:
+        Optional[str]: The code of the autotest, or None if the file can't be read.
+    """
+    # Read the content of the autotest file (a missing file is reported by the failed open)
+    try:
+        with open(file_path, "rb") as f:
+            raw = f.read()
+        # Test files are nearly always plain ASCII, which decodes faster than UTF-8
+        return raw.decode("ascii") if raw.isascii() else raw.decode("utf-8")
+    except Exception as e:
+        errors.append((file_path, f"read failed: {e}"))
+        return None
+
+
+def _batched(items: List[Tuple[str, str]], size: int) -> Iterator[List[Tuple[str, str]]]:
+    """
+    Splits a list into consecutive batches of at most `size` items.
+
+    Args:
+        items (List[Tuple[str, str]]): The items to split.
+        size (int): The maximum batch size.
+
+    Yields:
+        List[Tuple[str, str]]: The next batch.
+    """
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _drain_writes(writes: Queue, errors: List[Tuple[str, str]]) -> None:
+    """
+    Writes queued report files until a None sentinel is received. Runs in a dedicated writer
+    thread so disk writes don't hold up the threads waiting on the LLM.
+
+    Args:
+        writes (Queue): The queue of (path, payload bytes) items to write.
+        errors (List[Tuple[str, str]]): Collects (file or test, reason) pairs of failures.
+    """
+    while (item := writes.get()) is not None:
+        path, payload = item
+        try:
+            with open(path, "wb") as f:
+                f.write(payload)
+        except Exception as e:
+            errors.append((path, f"write failed: {e}"))
+        finally:
+            writes.task_done()
+    writes.task_done()
+
+
+def _save_review(writes: Queue, report_dir: str, test_id: str, review_data: dict) -> str:
+    """
+    Queues the structured review of a single test to be written to a JSON file.
+
+    Args:
+        writes (Queue): The queue drained by the report writer thread.
+        report_dir (str): The directory where review reports are stored.
+        test_id (str): The ID of the reviewed test.
+        review_data (dict): The structured review returned by the LLM.
+
+    Returns:
+        str: The path of the review file.
+    """
+    review_file = os.path.join(report_dir, f"ai_code_review_{test_id}.json")
+    # orjson serializes straight to UTF-8 bytes, so the file is written in binary mode
+    writes.put((review_file, orjson.dumps(review_data, option=orjson.OPT_INDENT_2)))
+    return review_file
+
+
+def _review_batch(batch: List[Tuple[str, str]], writes: Queue, errors: List[Tuple[str, str]],
+                  report_dir: str, model_name: str, temperature: float) -> List[Tuple[str, str]]:
+    """
+    Reviews a batch of autotests with a single LLM call and saves one report per test.
+    The response is streamed and parsed incrementally, so each report is written as soon as
+    its review has been generated. If the batched response can't be parsed, or lacks a review
+    for some test, those tests are reviewed again one by one.
+
+    Args:
+        batch (List[Tuple[str, str]]): The (test_id, code) pairs to review.
+        writes (Queue): The queue drained by the report writer thread.
+        errors (List[Tuple[str, str]]): Collects (file or test, reason) pairs of failures.
+        report_dir (str): The directory where review reports are stored.
+        model_name (str): The name of the LLM model to use.
+        temperature (float): The generation temperature.
+
+    Returns:
+        List[Tuple[str, str]]: (test_id, path) pairs of the generated review (or raw response) files.
+    """
+    batch_ids = {test_id for test_id, _ in batch}
+
+    # === Prompt Generation ===
+    # Only the per-file parts are formatted; the static instructions go as the system prompt
+    prompt_text = "".join(render_file_prompt(code, test_id) for test_id, code in batch)
+
+    # === LLM Call and Response Processing ===
+    stream = _FencedJSONStream(call_llm_stream(
+        model_name=model_name,
+        temperature=temperature,
+        prompt=prompt_text,
+        system_prompt=SYSTEM_PROMPT
+    ))
+    saved = {} # test_id -> review file
+    unmatched = [] # Reviews whose test_id doesn't match any test of the batch
+    parse_error = None
+    try:
+        # use_float keeps numbers as floats (ijson yields Decimal otherwise, which orjson can't serialize)
+        for review in ijson.items(stream, "reviews.item", use_float=True):
+            if not isinstance(review, dict):
+                continue
+            test_id = review.get("test_id")
+            if test_id in batch_ids and test_id not in saved:
+                saved[test_id] = _save_review(writes, report_dir, test_id, review)
+            else:
+                unmatched.append(review)
+        if not saved and not unmatched:
+            parse_error = "no reviews in response"
+    except ijson.JSONError as e:
+        parse_error = e
+    except Exception as e:
+        errors.extend((test_id, f"LLM call failed: {e}") for test_id, _ in batch if test_id not in saved)
+        return list(saved.items())
+
+    if len(batch) == 1 and not saved and len(unmatched) == 1:
+        # A single review with a mangled test_id still belongs to the only reviewed test
+        test_id = batch[0][0]
+        saved[test_id] = _save_review(writes, report_dir, test_id, unmatched[0])
+    elif len(batch) == 1 and not saved:
+        # If JSON parsing fails for a single file, save the raw LLM response for debugging
+        test_id = batch[0][0]
+        errors.append((test_id, f"JSON parse failed: {parse_error}; raw response saved"))
+        debug_file = os.path.join(report_dir, f"ai_code_review_{test_id}_raw.txt")
+        writes.put((debug_file, "".join(stream.received).encode("utf-8")))
+        return [(test_id, debug_file)]  # Add raw response file to artifacts to be sent to Telegram
+
+    review_files = list(saved.items())
+    missing = [(test_id, code) for test_id, code in batch if test_id not in saved]
+    if missing and len(batch) > 1:
+        # The batched response was malformed or incomplete: review the remaining tests one by one
+        for item in missing:
+            review_files.extend(_review_batch([item], writes, errors, report_dir, model_name, temperature))
+    return review_files
+
+
+def _review_cache_key(model_name: str, code: str) -> str:
+    """
+    Computes the review cache key of a test: the SHA-256 of everything that determines its review.
+    Changing the prompt or the model invalidates the cached reviews.
+
+    Args:
+        model_name (str): The name of the LLM model used for the review.
+        code (str): The code of the reviewed test.
+
+    Returns:
+        str: The hex digest used as the cache file name.
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, SYSTEM_PROMPT, FILE_TEMPLATE, code):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0") # Separator, so the boundaries between parts are unambiguous
+    return digest.hexdigest()
+
+
+def _load_cached_review(key: str) -> Optional[dict]:
     """
-    Extracts a JSON string from an LLM's raw text response by removing markdown code block delimiters.
-    This function is crucial when LLMs enclose JSON output within markdown blocks (e.g., ```json ... ```).
+    Loads a cached review.
 
     Args:
-        text (str): The raw text response received from the LLM.
+        key (str): The review cache key of the test.
 
     Returns:
-        str: A clean JSON string, suitable for parsing with `json.loads()`.
+        Optional[dict]: The cached review, or None if there is no (readable) cache entry.
     """
-    # Remove leading ```json or ``` and any whitespace
-    text = re.sub(r'^```(?:json)?\s*', '', text.strip(), flags=re.MULTILINE)
-    # Remove trailing ``` and any whitespace
-    text = re.sub(r'\s*```$', '', text, flags=re.MULTILINE)
-    return text
+    try:
+        with open(os.path.join(REVIEW_CACHE_DIR, f"{key}.json"), "rb") as f:
+            review_data = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return review_data if isinstance(review_data, dict) else None
+
+
+def _store_cached_review(key: str, review_file: str) -> None:
+    """
+    Stores a written review report in the review cache. The entry is written to a temporary
+    file and renamed into place, so concurrent runs never read a partially written entry.
+
+    Args:
+        key (str): The review cache key of the test.
+        review_file (str): The path of the review report to cache.
+    """
+    cache_file = os.path.join(REVIEW_CACHE_DIR, f"{key}.json")
+    temp_file = f"{cache_file}.{os.getpid()}.{get_ident()}.tmp"
+    try:
+        shutil.copyfile(review_file, temp_file)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        log_error(f"Failed to cache review {review_file}: {e}")
+
+
+def _copy_review(writes: Queue, report_dir: str, source_file: str, test_id: str) -> str:
+    """
+    Reuses the review of an identical test body for another test, rewriting its test_id.
+    Raw (unparsed) responses are copied as-is. The source file must already be written.
+
+    Args:
+        writes (Queue): The queue drained by the report writer thread.
+        report_dir (str): The directory where review reports are stored.
+        source_file (str): The review (or raw response) file of the identical test.
+        test_id (str): The ID of the test that receives the copy.
+
+    Returns:
+        str: The path of the copied review file.
+    """
+    if source_file.endswith(".json"):
+        with open(source_file, "rb") as f:
+            review_data = orjson.loads(f.read())
+        review_data["test_id"] = test_id
+        return _save_review(writes, report_dir, test_id, review_data)
+    target_file = os.path.join(report_dir, f"ai_code_review_{test_id}_raw.txt")
+    shutil.copyfile(source_file, target_file)
+    return target_file
 
 
 def run(ctx: dict) -> None:
     """
-    Executes the AI Code Review step. This function iterates through autotest files,
-    sends their content to an LLM for code review, and saves the LLM's structured
-    review responses as JSON files. It also handles cases where autotest files
-    are not explicitly provided in the context.
+    Executes the AI Code Review step. This function collects autotest files, sends their
+    content to an LLM for code review in batches of AI_REVIEW_BATCH_SIZE files per call
+    (up to AI_REVIEW_CONCURRENCY calls run concurrently), and saves the LLM's structured
+    review responses as one JSON file per test. Tests with identical code are reviewed once
+    and share the review. It also handles cases where autotest files are not explicitly
+    provided in the context.
 
     Args:
         ctx (dict): The pipeline context dictionary, which must contain:
@@ -56,11 +366,13 @@ def run(ctx: dict) -> None:
     if not autotest_files:
         autotests_dir = ctx.get("autotests_dir")
         if autotests_dir and os.path.isdir(autotests_dir):
-            autotest_files = [
-                os.path.join(autotests_dir, f)
-                for f in os.listdir(autotests_dir)
-                if f.endswith(".py")
-            ]
+            # scandir reports the entry type from the directory listing, avoiding a stat per file
+            with os.scandir(autotests_dir) as entries:
+                autotest_files = [
+                    entry.path
+                    for entry in entries
+                    if entry.name.endswith(".py") and entry.is_file()
+                ]
         else:
             print("❌ Neither 'autotest_files' nor 'autotests_dir' found in context. Skipping AI review.")
             ctx["ai_code_reviews"] = []
@@ -72,71 +384,86 @@ def run(ctx: dict) -> None:
         return
 
     # === LLM Configuration ===
-    llm_provider = os.getenv("LLM_PROVIDER", "cloud")
-    # Determine model name based on provider
-    model_name = os.getenv("CLOUD_MODEL_NAME", "gemini-pro") if llm_provider == "cloud" else os.getenv(
-        "LOCAL_MODEL_NAME", "llama2")
-    temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.3"))
+    model_name, temperature = _LLM_CFG.model_name, _LLM_CFG.temperature
 
-    reviews = [] # List to store paths of generated review files
-    for file_path in autotest_files:
-        if not os.path.isfile(file_path):
-            continue
+    # Test IDs are derived from the filenames up front, before any file is read
+    test_ids = list(map(_test_id, autotest_files))
+    # Failures are collected from all threads and reported once at the end, instead of a
+    # print per failed file
+    errors: List[Tuple[str, str]] = []
+    autotests = [
+        (test_id, code)
+        for test_id, code in zip(test_ids, (_read_autotest(path, errors) for path in autotest_files))
+        if code is not None
+    ]
 
-        # Read the content of the autotest file
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                code = f.read()
-        except Exception as e:
-            print(f"Failed to read {file_path}: {e}")
-            continue
+    # Identical test bodies get identical reviews, so only the first test of each distinct body
+    # is sent to the LLM; the others reuse its review afterwards
+    unique_autotests = []
+    first_test_by_digest: dict[str, str] = {}
+    duplicate_test_ids: dict[str, List[str]] = {} # first test_id -> test_ids with the same code
+    for test_id, code in autotests:
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        first_test_id = first_test_by_digest.setdefault(digest, test_id)
+        if first_test_id == test_id:
+            unique_autotests.append((test_id, code))
+        else:
+            duplicate_test_ids.setdefault(first_test_id, []).append(test_id)
 
-        # Extract test_id from the filename
-        test_id = os.path.splitext(os.path.basename(file_path))[0]
-        if test_id.startswith("test_"): # Remove 'test_' prefix if present
-            test_id = test_id[5:]
+    # Report files are written by a single writer thread, so the review threads go straight
+    # back to the LLM instead of waiting on the disk
+    writes: Queue = Queue()
+    writer = Thread(target=_drain_writes, args=(writes, errors), daemon=True)
+    writer.start()
+    reviews = [] # List to store paths of generated review files
+    try:
+        # Tests reviewed before (same code, prompt and model) are restored from the review cache
+        cached_reviews = [] # (test_id, review file) pairs restored from the cache
+        cache_keys: dict[str, str] = {} # test_id -> cache key, for the tests sent to the LLM
+        if not QA_LLM_NO_CACHE:
+            os.makedirs(REVIEW_CACHE_DIR, exist_ok=True)
+            to_review = []
+            for test_id, code in unique_autotests:
+                key = _review_cache_key(model_name, code)
+                review_data = _load_cached_review(key)
+                if review_data is None:
+                    cache_keys[test_id] = key
+                    to_review.append((test_id, code))
+                else:
+                    review_data["test_id"] = test_id
+                    cached_reviews.append((test_id, _save_review(writes, report_dir, test_id, review_data)))
+            unique_autotests = to_review
 
-        # === Prompt Generation ===
-        try:
-            prompt_text = PROMPT.format(code=code, test_id=test_id)
-        except KeyError as e:
-            # Fallback if prompt formatting fails (e.g., missing a key)
-            print(f"Prompt formatting failed (missing key {e}) for {file_path}. Using fallback.")
-            prompt_text = PROMPT.replace("{test_id}", test_id).format(code=code) # Attempt to format without specific key
-        except Exception as e:
-            print(f"Unexpected prompt error for {file_path}: {e}")
-            continue
+        # Longest tests first: their reviews take the longest, so starting them early keeps the
+        # concurrent LLM calls from ending on a single long straggler
+        unique_autotests.sort(key=lambda item: len(item[1]), reverse=True)
+        batches = list(_batched(unique_autotests, AI_REVIEW_BATCH_SIZE))
 
-        # === LLM Call ===
-        try:
-            raw_response = call_llm(
-                model_name=model_name,
-                temperature=temperature,
-                prompt=prompt_text
-            )
-        except Exception as e:
-            print(f"LLM call failed for {test_id}: {e}")
-            continue
+        # The LLM calls are I/O-bound and independent, so batches are reviewed concurrently.
+        # Each batch writes only its own report files; map() keeps the results in batch order.
+        with ThreadPoolExecutor(max_workers=min(AI_REVIEW_CONCURRENCY, len(batches) or 1)) as executor:
+            batch_results = list(executor.map(
+                lambda batch: _review_batch(batch, writes, errors, report_dir, model_name, temperature), batches
+            ))
 
-        # === Response Processing ===
-        try:
-            # Extract clean JSON from LLM's raw response
-            clean_json_str = _extract_json_from_llm_response(raw_response)
-            review_data = json.loads(clean_json_str)
-
-            # Save the structured review data to a JSON file
-            review_file = os.path.join(report_dir, f"ai_code_review_{test_id}.json")
-            with open(review_file, "w", encoding="utf-8") as f:
-                json.dump(review_data, f, indent=2, ensure_ascii=False)
-            reviews.append(review_file)
-
-        except (json.JSONDecodeError, ValueError) as e:
-            # If JSON parsing fails, save the raw LLM response for debugging
-            print(f"JSON parse failed for {test_id}: {e}. Saving raw response.")
-            debug_file = os.path.join(report_dir, f"ai_code_review_{test_id}_raw.txt")
-            with open(debug_file, "w", encoding="utf-8") as f:
-                f.write(raw_response)
-            reviews.append(debug_file)  # Add raw response file to artifacts to be sent to Telegram
+        writes.join() # Duplicates and cache entries are copied from the written reports
+        for batch_reviews in batch_results:
+            for test_id, review_file in batch_reviews:
+                # Only parsed reviews are cached; raw responses are retried on the next run
+                if test_id in cache_keys and review_file.endswith(".json") and os.path.isfile(review_file):
+                    _store_cached_review(cache_keys[test_id], review_file)
+
+        for batch_reviews in [cached_reviews, *batch_results]:
+            for test_id, review_file in batch_reviews:
+                reviews.append(review_file)
+                for duplicate_test_id in duplicate_test_ids.get(test_id, []):
+                    reviews.append(_copy_review(writes, report_dir, review_file, duplicate_test_id))
+    finally:
+        # Stop the writer once everything queued so far has been written
+        writes.put(None)
+        writer.join()
 
     ctx["ai_code_reviews"] = reviews
-    print(f"✅ AI Code Review completed. Generated {len(reviews)} report(s).")
\ No newline at end of file
+    if errors:
+        log_error("AI Code Review failures: " + "; ".join(f"{name}: {reason}" for name, reason in errors))
+    print(f"✅ AI Code Review completed. Generated {len(reviews)} report(s), {len(errors)} failure(s).")
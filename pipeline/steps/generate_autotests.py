@@ -6,8 +6,30 @@ selection and assertion generation based on test case details.
 import os
 import re
 import textwrap
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 
+# Words in step descriptions that indicate a negative (invalid input) login scenario
+NEGATIVE_KEYWORDS = ("invalid", "wrong", "incorrect", "blocked", "locked")
+# Compiled once into case-insensitive alternations, so each step is scanned for all keywords
+# in a single pass without lowercasing it first. "user" also matches "username".
+_NEGATIVE_KEYWORDS_RE = re.compile("|".join(NEGATIVE_KEYWORDS), re.IGNORECASE)
+_FIELD_KEYWORDS_RE = re.compile("user|password", re.IGNORECASE)
+# Characters not allowed in generated test file and function names
+_UNSAFE_ID_CHARS_RE = re.compile(r"[^a-zA-Z0-9_]")
+# Header of every generated test file: metadata comments, imports and the test function
+# signature; the generated test body follows it
+_TEST_FILE_HEADER = (
+    "# Test Case: {title}\n"
+    "# Requirement ID: {requirement_id}\n"
+    "# Severity: {severity}\n"
+    "# Type: {type}\n\n"
+    "import pytest\n\n"
+    "def test_{function_name}(driver):\n"
+)
+# Maximum number of autotest files written at the same time
+AUTOTEST_WRITE_WORKERS = 32
+
 def _get_saucedemo_credentials(test_type: str, step_descriptions: List[str]) -> Dict[str, str]:
     """
     Determines the appropriate username and password to use for a SauceDemo login test
@@ -29,13 +51,14 @@ def _get_saucedemo_credentials(test_type: str, step_descriptions: List[str]) ->
         "invalid_password": "wrong_password"
     }
 
-    # Check if step descriptions indicate a negative test scenario (e.g., invalid input)
-    all_steps = " ".join(step_descriptions).lower()
-    if any(word in all_steps for word in ["invalid", "wrong", "incorrect", "blocked", "locked"]):
+    # Check if step descriptions indicate a negative test scenario (e.g., invalid input).
+    # The scan stops at the first step containing a negative keyword.
+    if any(map(_NEGATIVE_KEYWORDS_RE.search, step_descriptions)):
         # Determine if the invalidity is related to username or password
-        if "username" in all_steps or "user" in all_steps:
+        fields = {match.lower() for step in step_descriptions for match in _FIELD_KEYWORDS_RE.findall(step)}
+        if "user" in fields:
             return {"username": creds["invalid_username"], "password": creds["valid_password"]}
-        elif "password" in all_steps:
+        elif "password" in fields:
             return {"username": creds["valid_username"], "password": creds["invalid_password"]}
         else:
             # Default to invalid password if specific invalid field is unclear
@@ -101,6 +124,35 @@ def _generate_test_body(testcase: Dict[str, Any]) -> str:
 
     return "\n".join(code_lines)
 
+def _write_autotest(output_dir: str, testcase: Dict[str, Any]) -> str:
+    """
+    Generates the Pytest file of a single test case and writes it to the output directory.
+
+    Args:
+        output_dir (str): The directory where autotest files are written.
+        testcase (Dict[str, Any]): The test case to convert into an autotest.
+
+    Returns:
+        str: The path of the written autotest file.
+    """
+    test_id = testcase.get("test_id", "NO_ID")
+    # Sanitize test_id to create a valid filename (replace invalid characters with underscores)
+    safe_test_id = _UNSAFE_ID_CHARS_RE.sub("_", test_id).lower()
+    file_name = f"test_{safe_test_id}.py"
+    file_path = os.path.join(output_dir, file_name)
+
+    # The whole file is assembled first and written with a single call
+    header = _TEST_FILE_HEADER.format(
+        title=testcase.get("title", "No Title"),
+        requirement_id=testcase.get("requirement_id", "N/A"),
+        severity=testcase.get("severity", "N/A"),
+        type=testcase.get("type", "N/A"),
+        function_name=safe_test_id
+    )
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(header + _generate_test_body(testcase))
+    return file_path
+
 def run(ctx: dict) -> None:
     """
     Executes the Generate Autotests step. It takes a list of test cases from the context,
@@ -125,7 +177,7 @@ def run(ctx: dict) -> None:
 
     # Create conftest.py if it doesn't already exist in the output directory
     conftest_path = os.path.join(output_dir, "conftest.py")
-    if not os.path.exists(conftest_path):
+    if not os.path.isfile(conftest_path):
         conftest_content = textwrap.dedent('''
             import pytest
             from selenium import webdriver
@@ -151,26 +203,10 @@ def run(ctx: dict) -> None:
         with open(conftest_path, "w", encoding="utf-8") as f:
             f.write(conftest_content)
 
-    autotest_files = [] # List to store paths of generated autotest files
-    for testcase in testcases:
-        test_id = testcase.get("test_id", "NO_ID")
-        # Sanitize test_id to create a valid filename (replace invalid characters with underscores)
-        safe_test_id = re.sub(r"[^a-zA-Z0-9_]", "_", test_id)
-        file_name = f"test_{safe_test_id.lower()}.py"
-        file_path = os.path.join(output_dir, file_name)
-
-        with open(file_path, "w", encoding="utf-8") as f:
-            # Add header comments to the test file for metadata
-            f.write(f"# Test Case: {testcase.get('title', 'No Title')}\n")
-            f.write(f"# Requirement ID: {testcase.get('requirement_id', 'N/A')}\n")
-            f.write(f"# Severity: {testcase.get('severity', 'N/A')}\n")
-            f.write(f"# Type: {testcase.get('type', 'N/A')}\n\n")
-            f.write("import pytest\n\n")
-            # Define the test function and insert the generated test body
-            f.write(f"def test_{safe_test_id.lower()}(driver):\n")
-            f.write(_generate_test_body(testcase))
-
-        autotest_files.append(file_path)
+    # Each test file depends only on its own test case, so the files are generated and written
+    # in parallel; map() keeps the paths in test case order
+    with ThreadPoolExecutor(max_workers=min(AUTOTEST_WRITE_WORKERS, len(testcases) or 1)) as executor:
+        autotest_files = list(executor.map(lambda testcase: _write_autotest(output_dir, testcase), testcases))
 
     # Store the output directory and list of generated files in the context
     ctx["autotests_dir"] = output_dir
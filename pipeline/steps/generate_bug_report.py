@@ -1,132 +1,131 @@
 """
 This module implements the Generate Bug Report step of the QA pipeline.
-It aggregates various artifacts from previous steps (test cases, autotests, code reviews,
-test results, QA summary) and uses an LLM to generate a structured bug report
-if discrepancies or issues are identified.
+It compares the test cases with the generated autotests and uses an LLM to generate
+a structured bug report if discrepancies or issues are identified.
 """
 import os
-import json
-import re
-from llm.llm_client import call_llm
-from llm.prompts.bug_report import PROMPT
+import orjson
+from llm.cache import cached_call_llm
+from llm.utils import extract_json_from_llm_response, truncate_middle
+from llm.prompts.bug_report import render as render_prompt
 from logs.logger import log_error
-from typing import Dict, Any
+from utils.files import read_texts
+from llm.config import load_llm_config
+from typing import Dict, Any, List, Optional
 
-def _extract_json_from_llm_response(text: str) -> str:
+# Model and temperature of the LLM call, resolved once from the environment
+_LLM_CFG = load_llm_config(default_temperature=0.3)
+# Character budgets of the prompt inputs; larger inputs are truncated in the middle
+MAX_PROMPT_CHARS = {"testcases": 40_000, "autotests": 40_000}
+
+def _concat_artifacts(paths: List[str], contents: Dict[str, Optional[str]]) -> str:
+    """
+    Concatenates the content of artifact files, each preceded by a header with its file name.
+    The parts are collected in a list and joined once, so the result is built in linear time.
+
+    Args:
+        paths (List[str]): The paths to the artifact files, in output order.
+        contents (Dict[str, Optional[str]]): The content read for each path (None for missing files, which are skipped).
+
+    Returns:
+        str: The concatenated content.
     """
-    Extracts a JSON string from an LLM's raw text response by removing markdown code block delimiters.
-    This function is a duplicate of one found in `ai_code_review.py` and could be moved to a shared utility module.
+    parts = []
+    for path in paths:
+        content = contents.get(path)
+        if content is not None:
+            parts.append(f"--- {os.path.basename(path)} ---\n{content}\n\n")
+    return "".join(parts)
+
+
+def _is_valid_report(response: str) -> bool:
+    """
+    Checks whether an LLM response holds a bug report that parses as JSON, i.e. whether it may be cached.
 
     Args:
-        text (str): The raw text response received from the LLM.
+        response (str): The raw LLM response.
 
     Returns:
-        str: A clean JSON string, suitable for parsing with `json.loads()`.
+        bool: True if the extracted report is valid JSON.
     """
-    text = re.sub(r'^```(?:json)?\s*', '', text.strip(), flags=re.MULTILINE)
-    text = re.sub(r'\s*```$', '', text, flags=re.MULTILINE)
-    return text
+    try:
+        orjson.loads(extract_json_from_llm_response(response))
+    except ValueError: # Includes orjson.JSONDecodeError
+        return False
+    return True
+
 
 def run(ctx: Dict[str, Any]) -> None:
     """
-    Executes the Generate Bug Report step. This function gathers all relevant artifacts
-    from the pipeline context, constructs a comprehensive prompt for the LLM,
+    Executes the Generate Bug Report step. This function gathers the test cases and autotests
+    from the pipeline context, constructs a prompt for the LLM,
     and uses the LLM to generate a structured bug report based on the provided data.
     The generated report (or a raw error log if parsing fails) is saved.
 
     Args:
         ctx (Dict[str, Any]): The pipeline context dictionary, expected to contain:
                               - 'run_id' (str): Unique identifier for the run.
-                              - 'masked_scenarios' (str): PII-masked scenarios (checklist).
                               - 'testcases_json' (list): List of generated test cases.
                               - 'autotest_files' (list): List of paths to generated autotest files.
-                              - 'ai_code_reviews' (list): List of paths to AI code review reports.
-                              - 'test_results_xml' (str): Path to the test results XML file.
-                              - 'qa_summary_text' (str): Text of the QA summary.
     """
     run_id = ctx["run_id"]
     report_dir = os.path.join("artifacts", run_id, "reports")
     os.makedirs(report_dir, exist_ok=True)
 
     # === Collect Input Artifacts ===
-    # PII-masked checklist content
-    checklist = ctx.get("masked_scenarios", "")
-
+    # The prompt compares the test cases with the autotests, so only those two are collected
     # Test cases (already a Python object, needs to be dumped to string for prompt)
     testcases = ctx.get("testcases_json", [])
-    testcases_str = json.dumps(testcases, indent=2, ensure_ascii=False)
+    # orjson emits UTF-8 directly, so non-ASCII text is kept as-is (like ensure_ascii=False).
+    # The JSON is compact: the LLM doesn't need indentation, and it only adds prompt tokens.
+    testcases_str = orjson.dumps(testcases).decode("utf-8")
+
+    # All autotest files are read in parallel up front. Duplicate paths (e.g. appended again
+    # by a retried step) are dropped, keeping the first occurrence, so each file is read once.
+    autotest_files = [path for path in dict.fromkeys(ctx.get("autotest_files", [])) if path.endswith(".py")]
+    contents = dict(zip(autotest_files, read_texts(autotest_files)))
 
     # Concatenate content of all generated autotest files
-    autotests = ""
-    autotest_files = ctx.get("autotest_files", [])
-    for file_path in autotest_files:
-        if file_path.endswith(".py") and os.path.exists(file_path):
-            with open(file_path, "r", encoding="utf-8") as f:
-                autotests += f"--- {os.path.basename(file_path)} ---\n{f.read()}\n\n"
-
-    # Concatenate content of all AI code review reports
-    reviews = ""
-    ai_reviews = ctx.get("ai_code_reviews", [])
-    for review_path in ai_reviews:
-        if os.path.exists(review_path):
-            with open(review_path, "r", encoding="utf-8") as f:
-                reviews += f"--- {os.path.basename(review_path)} ---\n{f.read()}\n\n"
-
-    # Read the test results XML content
-    test_results = ""
-    test_xml_path = ctx.get("test_results_xml")
-    if test_xml_path and os.path.exists(test_xml_path):
-        with open(test_xml_path, "r", encoding="utf-8") as f:
-            test_results = f.read()
-
-    # Get the QA summary text
-    qa_summary = ctx.get("qa_summary_text", "Not available")
+    autotests = _concat_artifacts(autotest_files, contents)
 
-    # === Generate LLM Prompt ===
-    try:
-        # Format the prompt using all collected artifacts
-        prompt = PROMPT.format(
-            checklist=checklist,
-            testcases=testcases_str,
-            tests=autotests,
-            review=reviews,
-            qa_summary=qa_summary,
-            test_results=test_results
-        )
-    except KeyError as e:
-        print(f"Prompt formatting failed: missing key {e}. Bug report generation skipped.")
+    # Nothing to compare: skip the LLM call when the prompt inputs are empty
+    if not testcases and not autotests.strip():
+        print("⚠️ No test cases or autotests found to generate a bug report. Skipping.")
         ctx["bug_report"] = None
         return
 
+    # === Generate LLM Prompt ===
+    prompt = render_prompt(
+        testcases=truncate_middle(testcases_str, MAX_PROMPT_CHARS["testcases"]),
+        tests=truncate_middle(autotests, MAX_PROMPT_CHARS["autotests"]),
+    )
+
     # === Call LLM to Generate Bug Report ===
     try:
-        # Configure LLM settings from environment variables (consistent with other steps)
-        # dotenv is loaded at module level, so no need to call load_dotenv() here again
-        llm_provider = os.getenv("LLM_PROVIDER", "cloud")
-        if llm_provider == "cloud":
-            model_name = os.getenv("CLOUD_MODEL_NAME", "gemini-pro")
-        else:
-            model_name = os.getenv("LOCAL_MODEL_NAME", "llama2")
-        temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.3"))
-
-        raw_response = call_llm(
+        # LLM settings are read from the environment once, at module import
+        model_name, temperature = _LLM_CFG.model_name, _LLM_CFG.temperature
+
+        # Only responses holding a valid JSON report are cached, so a malformed answer is not replayed
+        raw_response = cached_call_llm(
             model_name=model_name,
             temperature=temperature,
-            prompt=prompt
+            prompt=prompt,
+            validate=_is_valid_report
         )
 
-        # Extract and parse the JSON bug report from the LLM's response
-        clean_json_str = _extract_json_from_llm_response(raw_response)
-        bug_report = json.loads(clean_json_str)
+        # Extract the JSON bug report from the LLM's response. It is parsed only to validate it:
+        # valid JSON is saved exactly as the LLM returned it, without a re-serialization pass.
+        clean_json_str = extract_json_from_llm_response(raw_response)
+        orjson.loads(clean_json_str)
 
         # Save the structured bug report to a JSON file
         report_file = os.path.join(report_dir, "bug_report.json")
         with open(report_file, "w", encoding="utf-8") as f:
-            json.dump(bug_report, f, indent=2, ensure_ascii=False)
+            f.write(clean_json_str)
         ctx["bug_report"] = report_file
         print(f"✅ Bug report generated and saved to {report_file}")
 
-    except (json.JSONDecodeError, ValueError) as e:
+    except ValueError as e: # Includes orjson.JSONDecodeError
         # If JSON parsing fails, save the raw LLM response for debugging purposes
         print(f"Failed to parse bug report JSON: {e}. Raw response saved.")
         error_file = os.path.join(report_dir, "bug_report_raw.txt")
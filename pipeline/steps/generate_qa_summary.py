@@ -4,11 +4,22 @@ It processes test execution logs and XML reports to create a concise, high-level
 QA summary using an LLM, making it accessible for non-technical stakeholders.
 """
 import os
-from llm.llm_client import call_llm
+from llm.cache import cached_call_llm
 from llm.prompts.qa_summary import PROMPT
 from logs.logger import log_error
+from utils.files import IO_POOL, read_text_tail
+from utils.junit import summarize_junit
+from llm.config import load_llm_config
+from llm.utils import truncate_middle
 from typing import Dict, Any
 
+# Model and temperature of the LLM call, resolved once from the environment
+_LLM_CFG = load_llm_config(default_temperature=0.3)
+# Byte budgets of the prompt inputs. Only the end of the test log is sent to the LLM: it holds
+# the failures and the final counts. The XML summary is truncated in the middle if it is larger.
+TEST_LOG_TAIL_BYTES = 20_000
+TEST_XML_MAX_CHARS = 20_000
+
 def run(ctx: Dict[str, Any]) -> None:
     """
     Executes the Generate QA Summary step. This function gathers test log and
@@ -30,17 +41,13 @@ def run(ctx: Dict[str, Any]) -> None:
     test_log_path = ctx.get("test_run_log")
     test_xml_path = ctx.get("test_results_xml")
 
-    # Read content of test log file
-    test_log = ""
-    if test_log_path and os.path.exists(test_log_path):
-        with open(test_log_path, 'r', encoding='utf-8') as f:
-            test_log = f.read()
-
-    # Read content of test XML report file
-    test_xml = ""
-    if test_xml_path and os.path.exists(test_xml_path):
-        with open(test_xml_path, 'r', encoding='utf-8') as f:
-            test_xml = f.read()
+    # Read the tail of the test log and summarize the XML report in parallel; missing files read as empty.
+    # The XML report is streamed into counts and failure messages rather than embedded whole.
+    log_future = IO_POOL.submit(read_text_tail, test_log_path, TEST_LOG_TAIL_BYTES) if test_log_path else None
+    xml_future = IO_POOL.submit(summarize_junit, test_xml_path) if test_xml_path else None
+    test_log = (log_future.result() if log_future else None) or ""
+    test_xml = (xml_future.result() if xml_future else None) or ""
+    test_xml = truncate_middle(test_xml, TEST_XML_MAX_CHARS)
 
     # If no test data is available, skip summary generation
     if not test_log and not test_xml:
@@ -51,22 +58,19 @@ def run(ctx: Dict[str, Any]) -> None:
 
     # === Call LLM to Generate QA Summary ===
     try:
-        # Configure LLM settings from environment variables (consistent with other steps)
-        llm_provider = os.getenv("LLM_PROVIDER", "cloud")
-        if llm_provider == "cloud":
-            model_name = os.getenv("CLOUD_MODEL_NAME", "gemini-pro")
-        else:
-            model_name = os.getenv("LOCAL_MODEL_NAME", "llama2")
-        temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.3"))
+        # LLM settings are read from the environment once, at module import
+        model_name, temperature = _LLM_CFG.model_name, _LLM_CFG.temperature
 
         # Format the prompt using collected test data
         prompt = PROMPT.format(test_log=test_log, test_xml=test_xml)
 
         # Call the LLM to get the summary
-        summary_text = call_llm(
+        # Only non-empty summaries are cached, so an empty answer is not replayed on the next run
+        summary_text = cached_call_llm(
             model_name=model_name,
             temperature=temperature,
-            prompt=prompt
+            prompt=prompt,
+            validate=lambda response: bool(response.strip())
         )
 
         # Handle empty LLM response
@@ -3,11 +3,15 @@ This module implements the Generate Scenarios step of the QA pipeline.
 It utilizes a Large Language Model (LLM) to convert a masked checklist of requirements
 into a set of detailed test scenarios, which are then stored in the pipeline context.
 """
-import os
-from llm.llm_client import call_llm
+from llm.cache import cached_call_llm
 from llm.prompts.scenarios import PROMPT
+from utils.exceptions import PipelineError
+from llm.config import load_llm_config
 from typing import Dict, Any
 
+# Model and temperature of the LLM call, resolved once from the environment
+_LLM_CFG = load_llm_config(default_temperature=0.7)
+
 def run(ctx: Dict[str, Any]) -> None:
     """
     Executes the Generate Scenarios step. It takes the PII-masked checklist from the
@@ -17,24 +21,27 @@ def run(ctx: Dict[str, Any]) -> None:
     Args:
         ctx (Dict[str, Any]): The pipeline context dictionary, which must contain:
                               - 'masked_scenarios' (str): The PII-masked checklist content.
+
+    Raises:
+        PipelineError: If the masked checklist is empty, so there is nothing to send to the LLM.
     """
-    # Configure LLM provider and model name based on environment variables
-    llm_provider = os.getenv("LLM_PROVIDER", "cloud")
-    if llm_provider == "cloud":
-        model_name = os.getenv("CLOUD_MODEL_NAME", "gemini-pro")
-    else:
-        model_name = os.getenv("LOCAL_MODEL_NAME", "llama2")
-    
-    # Set temperature for LLM generation from environment variable
-    temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
-    
-    # Get the masked scenarios from the context
+    # Get the masked scenarios from the context; an empty checklist fails fast without an LLM call
     scenarios_input = ctx["masked_scenarios"]
+    if not scenarios_input or not scenarios_input.strip():
+        raise PipelineError("The checklist is empty, so no scenarios can be generated.")
+
+    # LLM provider, model name and temperature are read from the environment once, at module import
+    model_name, temperature = _LLM_CFG.model_name, _LLM_CFG.temperature
+    
     # Format the prompt using the masked scenarios
     prompt_text = PROMPT.format(checklist=scenarios_input)
     
     # Call the LLM to generate the scenarios
-    result = call_llm(model_name=model_name, temperature=temperature, prompt=prompt_text)
+    # Only non-empty scenarios are cached, so an empty answer is not replayed on the next run
+    result = cached_call_llm(
+        model_name=model_name, temperature=temperature, prompt=prompt_text,
+        validate=lambda response: bool(response.strip())
+    )
     
     # Store the generated scenarios back into the context
     ctx["scenarios"] = result
@@ -5,25 +5,41 @@ to convert them into a structured JSON array of test cases.
 """
 import logging
 import os
-import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+from llm.cache import load_cached_response, store_cached_response
 from llm.llm_client import call_llm
+from llm.prompts.testcases import PROMPT
 from logs.logger import log_error  # Used for critical errors
+from llm.config import load_llm_config
 from typing import Dict, Any, List
 
-# Load environment variables. This should ideally be done once at application startup.
+# Model and temperature of the LLM call, resolved once from the environment
+_LLM_CFG = load_llm_config(default_temperature=0.7)
+# JSON string literals or single-line comments (e.g. `// ...`) in LLM JSON output, compiled once
+# at import. Matching string literals as whole tokens means a `//` inside a string (such as a URL)
+# is never taken for a comment. The ASCII flag lets the engine skip Unicode character tables.
+_STRING_OR_COMMENT = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*', re.ASCII)
+# Large scenario sets are split (at blank lines between scenarios) into up to this many
+# batches, which are converted by concurrent LLM calls and merged
+TESTCASES_BATCHES = max(1, int(os.getenv("TESTCASES_BATCHES", "4")))
+# Scenario texts shorter than this are always converted in a single LLM call
+TESTCASES_BATCH_MIN_CHARS = 4000
+_SCENARIO_SEPARATOR_RE = re.compile(r"\n\s*\n")
 
 def _extract_json_obj(text: str) -> str:
     """
     Extracts the outermost JSON object (enclosed by `{...}`) from a given text
-    and removes single-line comments (e.g., `// ...`). This is useful for
-    cleaning LLM responses that might contain extra text or comments around the JSON.
+    and removes single-line comments (e.g., `// ...`) outside string literals. This is useful
+    for cleaning LLM responses that might contain extra text or comments around the JSON.
+    Comments are removed in a single regex pass that keeps string literals intact.
 
     Args:
         text (str): The raw text potentially containing a JSON object.
 
     Returns:
-        str: A cleaned JSON string suitable for `json.loads()`.
+        str: A cleaned JSON string suitable for `orjson.loads()`.
 
     Raises:
         ValueError: If no valid outermost JSON object is detected.
@@ -33,11 +49,140 @@ def _extract_json_obj(text: str) -> str:
     if start == -1 or end == -1 or start >= end:
         raise ValueError("No valid JSON object detected in LLM response")
     json_str = text[start:end + 1]
-    # Remove single-line comments (e.g., // some comment)
-    json_str = re.sub(r"//.*", "", json_str)
+    # Remove single-line comments (e.g., // some comment); string literals are kept as they are
+    # (a comment match leaves group 1 unset, which the template substitutes with "")
+    json_str = _STRING_OR_COMMENT.sub(r"\1", json_str)
     return json_str
 
 
+def _scenario_blocks(scenarios: str) -> List[str]:
+    """
+    Splits the scenario text into scenarios at blank lines.
+
+    Args:
+        scenarios (str): The generated test scenarios.
+
+    Returns:
+        List[str]: The non-empty scenario blocks, in their original order.
+    """
+    return [block for block in _SCENARIO_SEPARATOR_RE.split(scenarios.strip()) if block.strip()]
+
+
+def _group_scenarios(blocks: List[str], batches: int) -> List[List[str]]:
+    """
+    Groups consecutive scenario blocks into at most `batches` groups of similar size, one per
+    LLM call. Small scenario sets are kept in a single group.
+
+    Args:
+        blocks (List[str]): The scenario blocks.
+        batches (int): The maximum number of groups.
+
+    Returns:
+        List[List[str]]: The groups of scenario blocks, in their original order.
+    """
+    total_size = sum(len(block) for block in blocks)
+    if batches <= 1 or len(blocks) < 2 or total_size < TESTCASES_BATCH_MIN_CHARS:
+        return [blocks] if blocks else []
+
+    target_size = -(-total_size // batches) # Ceiling division
+    groups: List[List[str]] = []
+    current: List[str] = []
+    current_size = 0
+    for block in blocks:
+        current.append(block)
+        current_size += len(block)
+        if current_size >= target_size and len(groups) < batches - 1:
+            groups.append(current)
+            current, current_size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _generate_batch(scenarios: str) -> List[Dict[str, Any]]:
+    """
+    Converts a set of scenarios into test cases with one LLM call. Identical prompts are served
+    from the on-disk response cache; a response that can't be parsed is retried once.
+
+    Args:
+        scenarios (str): The scenarios to convert.
+
+    Returns:
+        List[Dict[str, Any]]: The test cases parsed from the LLM response.
+
+    Raises:
+        ValueError: If the prompt can't be formatted or the LLM doesn't return valid test case JSON.
+        LLMError: If the LLM call fails.
+    """
+    model_name, temperature = _LLM_CFG.model_name, _LLM_CFG.temperature
+
+    # === Prompt Formatting ===
+    try:
+        prompt_text = PROMPT.format(scenarios=scenarios)
+    except (KeyError, IndexError, ValueError) as e:
+        error_msg = f"Prompt formatting failed: {e}"
+        log_error(error_msg)
+        raise ValueError(f"Failed to format prompt: {e}")
+
+    # === LLM Call ===
+    # A new response is cached only after it parses, so a malformed response is never replayed to later runs
+    cached_result = load_cached_response(model_name, temperature, prompt_text)
+    result = cached_result if cached_result is not None else call_llm(
+        model_name=model_name, temperature=temperature, prompt=prompt_text)
+
+    for attempt in (1, 2):
+        logging.debug("Raw LLM response (first 500 chars): %.500s...", result)
+
+        # === Extract and Parse JSON ===
+        try:
+            json_str = _extract_json_obj(result)
+            parsed = orjson.loads(json_str)
+
+            if "testcases" not in parsed:
+                error_msg = "LLM response JSON missing 'testcases' key"
+                log_error(f"{error_msg}. Raw response: {json_str}")
+                raise ValueError(error_msg)
+
+            if cached_result is None or attempt > 1:
+                store_cached_response(result, model_name, temperature, prompt_text)
+            return parsed["testcases"]
+
+        except ValueError as e: # Includes orjson.JSONDecodeError
+            error_msg = (
+                f"Failed to parse LLM response as JSON: {e}\n"
+                f"Raw response (first 500 chars): {result[:500]}..."
+            )
+            log_error(error_msg)
+            if attempt > 1:
+                raise ValueError(
+                    f"LLM did not return valid JSON for test cases. Error: {e}\n"
+                    f"Response snippet: {result[:500]}..."
+                )
+            # Retry once with a fresh LLM call; call_llm doesn't memoize, and the disk cache isn't consulted again
+            result = call_llm(model_name=model_name, temperature=temperature, prompt=prompt_text)
+
+
+def _make_test_ids_unique(testcases: List[Dict[str, Any]]) -> None:
+    """
+    Renames duplicate test IDs in place (e.g., two batches both numbering from TC-001), since
+    each test ID becomes the name of an autotest file. Later duplicates get a numeric suffix.
+
+    Args:
+        testcases (List[Dict[str, Any]]): The merged test cases.
+    """
+    seen = set()
+    for testcase in testcases:
+        if not isinstance(testcase, dict):
+            continue
+        test_id = testcase.get("test_id")
+        if isinstance(test_id, str) and test_id in seen:
+            suffix = 2
+            while f"{test_id}-{suffix}" in seen:
+                suffix += 1
+            testcase["test_id"] = test_id = f"{test_id}-{suffix}"
+        seen.add(test_id)
+
+
 def run(ctx: Dict[str, Any]) -> None:
     """
     Executes the Generate Test Cases step. It retrieves test scenarios from the
@@ -50,15 +195,6 @@ def run(ctx: Dict[str, Any]) -> None:
         ctx (Dict[str, Any]): The pipeline context dictionary, which must contain:
                               - 'scenarios' (str): A string containing the generated test scenarios.
     """
-    # === LLM Configuration ===
-    llm_provider = os.getenv("LLM_PROVIDER", "cloud")
-    if llm_provider == "cloud":
-        model_name = os.getenv("CLOUD_MODEL_NAME", "gemini-pro")
-    else:  # local
-        model_name = os.getenv("LOCAL_MODEL_NAME", "llama2")
-
-    temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.7"))
-
     # === Input Data Validation ===
     if "scenarios" not in ctx:
         available_keys = list(ctx.keys())
@@ -67,43 +203,22 @@ def run(ctx: Dict[str, Any]) -> None:
         raise ValueError(error_msg)
 
     scenarios = ctx["scenarios"]
-    logging.debug(f"Input scenarios (first 500 chars): {str(scenarios)[:500]}...")
-
-    # === Prompt Formatting ===
-    # The PROMPT is imported from llm.prompts.testcases
-    from llm.prompts.testcases import PROMPT
-    try:
-        prompt_text = PROMPT.format(scenarios=scenarios)
-    except (KeyError, IndexError, ValueError) as e:
-        error_msg = f"Prompt formatting failed: {e}"
-        log_error(error_msg)
-        raise ValueError(f"Failed to format prompt: {e}")
-
-    # === LLM Call ===
-    result = call_llm(model_name=model_name, temperature=temperature, prompt=prompt_text)
-    logging.debug(f"Raw LLM response (first 500 chars): {result[:500]}...")
-
-    # === Extract and Parse JSON ===
-    try:
-        json_str = _extract_json_obj(result)
-        parsed = json.loads(json_str)
-
-        if "testcases" not in parsed:
-            error_msg = "LLM response JSON missing 'testcases' key"
-            log_error(f"{error_msg}. Raw response: {json_str}")
-            raise ValueError(error_msg)
-
-        ctx["testcases_json"] = parsed["testcases"]
-        logging.info("Successfully parsed test cases from LLM response")
-        print("✅ Test cases generated successfully.")
-
-    except (json.JSONDecodeError, ValueError) as e:
-        error_msg = (
-            f"Failed to parse LLM response as JSON: {e}\n"
-            f"Raw response (first 500 chars): {result[:500]}..."
-        )
-        log_error(error_msg)
-        raise ValueError(
-            f"LLM did not return valid JSON for test cases. Error: {e}\n"
-            f"Response snippet: {result[:500]}..."
-        )
\ No newline at end of file
+    # Lazy %-formatting: the precision in %.500s truncates only when DEBUG logging is enabled
+    logging.debug("Input scenarios (first 500 chars): %.500s...", scenarios)
+
+    # === Batched LLM Calls ===
+    # The batches are a deterministic function of the whole scenario text, so an unchanged input
+    # produces the same prompts and is served from the response cache in _generate_batch.
+    # Batches are independent, so they are converted concurrently; map() keeps them in order
+    groups = _group_scenarios(_scenario_blocks(scenarios) or [scenarios], TESTCASES_BATCHES)
+    # A single batch is sent as the original text, exactly as the scenarios step produced it
+    batches = ["\n\n".join(group) for group in groups] if len(groups) > 1 else [scenarios]
+    with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+        batch_testcases = list(executor.map(_generate_batch, batches))
+
+    testcases = [testcase for generated in batch_testcases for testcase in generated]
+    if len(batches) > 1:
+        _make_test_ids_unique(testcases)
+    ctx["testcases_json"] = testcases
+    logging.info("Successfully parsed test cases from LLM response")
+    print(f"✅ Test cases generated successfully ({len(testcases)} from {len(batches)} LLM call(s)).")
@@ -4,16 +4,65 @@ It executes the generated Pytest autotests, captures their output,
 generates XML and HTML reports, parses the XML for a summary,
 and stores all relevant results and report paths in the pipeline context.
 """
+import mmap
 import os
+import re
+import shutil
 import subprocess
-import xmltodict
+import xml.etree.ElementTree as ET
 from logs.logger import log_error
-from typing import Dict, Any, Union, List
+from typing import Dict, Any, Union, List, Optional
+
+# Only the first few kilobytes of the report are searched for the <testsuite> tag;
+# pytest writes it right after the XML declaration and the <testsuites> wrapper
+XML_HEADER_BYTES = 4096
+_TESTSUITE_TAG_RE = re.compile(rb"<testsuite(\s[^>]*)?>")
+_XML_ATTR_RE = re.compile(rb'([\w:-]+)\s*=\s*"([^"]*)"')
+
+# Chunk size used when copying the HTML report behind the Run ID header
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def _read_testsuite_header(xml_path: str) -> Optional[Dict[str, int]]:
+    """
+    Fast path for _parse_test_results: reads the counters straight from the attributes
+    of the <testsuite> tag at the head of the report, without building any XML events.
+    It only applies when the report holds exactly one <testsuite>, which is what pytest writes;
+    the rest of the file is checked for further suites with a byte search, not a parse.
+
+    Args:
+        xml_path (str): The file path to the JUnit XML report.
+
+    Returns:
+        Optional[Dict[str, int]]: The "tests", "failures", "errors" and "skipped" counters,
+                                  or None if the fast path doesn't apply and the report
+                                  has to be parsed in full.
+    """
+    try:
+        with open(xml_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            match = _TESTSUITE_TAG_RE.search(mm, 0, XML_HEADER_BYTES)
+            if not match or _TESTSUITE_TAG_RE.search(mm, match.end()):
+                return None
+            attributes = dict(_XML_ATTR_RE.findall(match.group(1) or b""))
+    except (OSError, ValueError): # ValueError: an empty file can't be mapped
+        return None
+
+    try:
+        return {
+            name: int(attributes.get(name.encode(), b"0"))
+            for name in ("tests", "failures", "errors", "skipped")
+        }
+    except ValueError:
+        return None
+
 
 def _parse_test_results(xml_path: str) -> Dict[str, Union[int, str]]:
     """
     Parses a JUnit XML test report to extract a summary of test execution results.
-    It counts total, passed, failed, errored, and skipped tests.
+    It counts total, passed, failed, errored, and skipped tests. Single-suite reports are
+    answered from the <testsuite> tag at the head of the file; otherwise the report is streamed:
+    only the attributes of the <testsuite> elements are read, and every element is
+    cleared once parsed, so memory use doesn't grow with the number of test cases.
 
     Args:
         xml_path (str): The file path to the JUnit XML report.
@@ -26,35 +75,38 @@ def _parse_test_results(xml_path: str) -> Dict[str, Union[int, str]]:
     if not os.path.exists(xml_path):
         return {"error": "XML report not found"}
 
-    try:
-        with open(xml_path, "r", encoding="utf-8") as f:
-            data = xmltodict.parse(f.read())
-
-        # XML structure can vary (single <testsuite> or <testsuites> containing multiple <testsuite>)
-        testsuite_data = data.get("testsuites", {}).get("testsuite")
-        if not testsuite_data:
-            testsuite_data = data.get("testsuite") # Direct access if only one testsuite
-
-        if not testsuite_data:
-            return {"error": "No testsuite found in XML"}
+    header = _read_testsuite_header(xml_path)
+    if header is not None:
+        return {
+            "total": header["tests"],
+            "passed": header["tests"] - header["failures"] - header["errors"] - header["skipped"],
+            "failed": header["failures"],
+            "errors": header["errors"],
+            "skipped": header["skipped"]
+        }
 
+    try:
         total_tests = 0
         total_failures = 0
         total_errors = 0
         total_skipped = 0
-
-        # Aggregate results if there are multiple testsuites
-        if isinstance(testsuite_data, list):
-            for ts in testsuite_data:
-                total_tests += int(ts.get("@tests", 0))
-                total_failures += int(ts.get("@failures", 0))
-                total_errors += int(ts.get("@errors", 0))
-                total_skipped += int(ts.get("@skipped", 0))
-        else: # Single testsuite
-            total_tests = int(testsuite_data.get("@tests", 0))
-            total_failures = int(testsuite_data.get("@failures", 0))
-            total_errors = int(testsuite_data.get("@errors", 0))
-            total_skipped = int(testsuite_data.get("@skipped", 0))
+        found_testsuite = False
+
+        # The report may have a single <testsuite> root or a <testsuites> root containing several;
+        # the counts are aggregated over all <testsuite> elements either way
+        for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+            if event == "start":
+                if elem.tag == "testsuite":
+                    found_testsuite = True
+                    total_tests += int(elem.get("tests", 0))
+                    total_failures += int(elem.get("failures", 0))
+                    total_errors += int(elem.get("errors", 0))
+                    total_skipped += int(elem.get("skipped", 0))
+            else:
+                elem.clear() # Drop parsed test cases, only the testsuite attributes are needed
+
+        if not found_testsuite:
+            return {"error": "No testsuite found in XML"}
 
         passed = total_tests - total_failures - total_errors - total_skipped
         return {
@@ -112,39 +164,42 @@ def run(ctx: Dict[str, Any]) -> None:
             "-v"                                  # Verbose output
         ]
 
-        # Execute pytest as a subprocess
-        result = subprocess.run(
-            pytest_command,
-            capture_output=True, # Capture stdout and stderr
-            text=True,           # Decode output as text
-            check=False,         # Do not raise an exception for non-zero exit codes (pytest reports failures via exit code)
-            cwd="/app"           # Execute from the /app directory (Docker context)
-        )
-
         # --- Add Run ID to Reports ---
         run_id_header = f"Run ID: {run_id}\n{'='*50}\n\n"
 
+        # Execute pytest as a subprocess. Its stdout goes straight into the log file instead of
+        # being buffered in memory until pytest exits; only stderr (usually short) is captured.
+        with open(log_file_path, "w", encoding="utf-8") as log_file:
+            log_file.write(run_id_header + "=== STDOUT ===\n")
+            log_file.flush() # The header must be on disk before pytest starts writing to the file
+            result = subprocess.run(
+                pytest_command,
+                stdout=log_file,        # Stream stdout into the log file
+                stderr=subprocess.PIPE, # Capture stderr for its own log section
+                text=True,              # Decode stderr as text
+                check=False,            # Do not raise an exception for non-zero exit codes (pytest reports failures via exit code)
+                cwd="/app"              # Execute from the /app directory (Docker context)
+            )
+            # Complete the log file with stderr and the exit code
+            log_file.write(
+                "\n=== STDERR ===\n" + result.stderr +
+                f"\n=== EXIT CODE ===\n{result.returncode}\n"
+            )
+
         # Prepend Run ID to HTML report if it was generated
         if os.path.exists(html_report_path):
-            with open(html_report_path, "r", encoding="utf-8") as f:
-                html_content = f.read()
-            with open(html_report_path, "w", encoding="utf-8") as f:
-                f.write(run_id_header + html_content)
+            # The self-contained report can be several megabytes, so it is streamed
+            # behind the header into a temporary file instead of being read into memory
+            tmp_path = html_report_path + ".tmp"
+            with open(html_report_path, "rb") as src, open(tmp_path, "wb") as dst:
+                dst.write(run_id_header.encode("utf-8"))
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            os.replace(tmp_path, html_report_path)
         else:
             log_error("HTML report was not generated. Check if 'pytest-html' is installed and working.")
             ctx["test_report_html"] = None
 
 
-        # Create a comprehensive log file including stdout, stderr, and exit code
-        log_content = (
-            run_id_header +
-            "=== STDOUT ===\n" + result.stdout +
-            "\n=== STDERR ===\n" + result.stderr +
-            f"\n=== EXIT CODE ===\n{result.returncode}\n"
-        )
-        with open(log_file_path, "w", encoding="utf-8") as f:
-            f.write(log_content)
-
         # Parse the generated JUnit XML report for summary statistics
         summary = _parse_test_results(xml_report_path)
         ctx["test_summary"] = summary # Store the summary in context
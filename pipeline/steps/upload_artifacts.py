@@ -5,112 +5,266 @@ such as scenarios, test cases, autotests, various reports, and raw inputs,
 and upload them to Minio object storage for persistent archival and access.
 """
 import os
-from storage.minio_client import upload
+import tarfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+import orjson
+from storage.minio_client import MINIO_BUCKET, copy, upload, upload_compressed, upload_file, upload_file_compressed
 from logs.logger import log_error
-from typing import Dict, Any, Union
+from utils.files import file_digest
+from typing import Callable, Dict, Any, List, Tuple, Union
 
-def run(ctx: Dict[str, Any]) -> None:
+# Maximum number of artifact uploads in flight at the same time
+UPLOAD_CONCURRENCY = max(1, int(os.getenv("UPLOAD_CONCURRENCY", "8")))
+
+# Text artifacts are Zstandard-compressed before upload and stored with a ".zst" suffix
+# (set COMPRESS_ARTIFACTS=0 to upload them as-is)
+COMPRESS_ARTIFACTS = os.getenv("COMPRESS_ARTIFACTS", "1") == "1"
+# File extensions of artifacts that are text and compress well
+COMPRESSED_EXTENSIONS = frozenset({".txt", ".log", ".html", ".xml", ".json"})
+
+def _object_path(file_path: str, minio_path: str) -> str:
     """
-    Executes the Upload Artifacts step. This function iterates through all relevant
-    data and files stored in the pipeline context, uploading each artifact to
-    the configured Minio bucket under a directory specific to the current run ID.
+    Returns the Minio path a file artifact is stored at: text files get a ".zst" suffix
+    when they are compressed.
 
     Args:
-        ctx (Dict[str, Any]): The pipeline context dictionary containing paths
-                              or content of all generated artifacts.
+        file_path (str): The local path to the file.
+        minio_path (str): The destination path for the file within the Minio bucket.
+
+    Returns:
+        str: The path of the stored object.
     """
-    run_id = ctx["run_id"]
-    bucket_name = os.getenv("MINIO_BUCKET", "qa-pipeline")
-
-    def upload_file(file_path: str, minio_path: str) -> None:
-        """
-        Helper function to upload a single file from the local filesystem to Minio.
-
-        Args:
-            file_path (str): The local path to the file to be uploaded.
-            minio_path (str): The destination path for the file within the Minio bucket.
-        """
-        if file_path and os.path.exists(file_path):
-            try:
-                with open(file_path, 'rb') as f:
-                    content_bytes = f.read()
-                upload(bucket_name, minio_path, content_bytes)
+    if COMPRESS_ARTIFACTS and os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        return minio_path + ".zst"
+    return minio_path
+
+def _upload_file(file_path: str, minio_path: str) -> None:
+    """
+    Uploads a single file from the local filesystem to Minio. The file is streamed
+    from disk rather than read into memory first; text files are compressed on the way.
+    The upload is skipped if the object already holds the same file content.
+
+    Args:
+        file_path (str): The local path to the file to be uploaded.
+        minio_path (str): The destination path for the file within the Minio bucket.
+    """
+    if file_path and os.path.exists(file_path):
+        try:
+            # Files already archived with the same content (e.g. when a run is uploaded again) are skipped
+            object_path = _object_path(file_path, minio_path)
+            if object_path != minio_path:
+                minio_path = object_path
+                uploaded = upload_file_compressed(MINIO_BUCKET, minio_path, file_path, skip_unchanged=True)
+            else:
+                uploaded = upload_file(MINIO_BUCKET, minio_path, file_path, skip_unchanged=True)
+            if uploaded:
                 print(f"Uploaded file: {file_path} to Minio path: {minio_path}")
-            except Exception as e:
-                log_error(f"Failed to upload file {file_path} to {minio_path}: {e}")
+            else:
+                print(f"Skipped unchanged file: {file_path} (already at Minio path: {minio_path})")
+        except Exception as e:
+            log_error(f"Failed to upload file {file_path} to {minio_path}: {e}")
+    else:
+        log_error(f"File not found for upload: {file_path}")
+
+def _upload_content(content: Union[str, Dict[str, Any], List[Any], None], minio_path: str) -> None:
+    """
+    Uploads string content (or JSON-serializable content) to Minio, compressed unless
+    COMPRESS_ARTIFACTS is disabled.
+
+    Args:
+        content (Union[str, Dict[str, Any], List[Any], None]): The string content or
+                                                                JSON-serializable object to be uploaded.
+        minio_path (str): The destination path for the content within the Minio bucket.
+    """
+    if content is None:
+        return
+
+    # If content is a dict or list, assume it's JSON and serialize it
+    if isinstance(content, (dict, list)):
+        content_bytes = orjson.dumps(content, option=orjson.OPT_INDENT_2)
+    elif isinstance(content, str):
+        content_bytes = content.encode('utf-8')
+    else:
+        log_error(f"Unsupported content type for upload to {minio_path}: {type(content)}")
+        return
+
+    try:
+        if COMPRESS_ARTIFACTS:
+            minio_path += ".zst"
+            upload_compressed(MINIO_BUCKET, minio_path, content_bytes)
+        else:
+            upload(MINIO_BUCKET, minio_path, content_bytes)
+        print(f"Uploaded content to Minio path: {minio_path}")
+    except Exception as e:
+        log_error(f"Failed to upload content to {minio_path}: {e}")
+
+def _upload_archive(file_paths: List[str], minio_path: str) -> None:
+    """
+    Packs several small files into a single tar archive and uploads it as one object
+    (".tar.zst" when compressed), which costs one request instead of one per file.
+
+    Args:
+        file_paths (List[str]): The local paths of the files to archive; they are stored by file name.
+        minio_path (str): The destination path of the archive within the Minio bucket, without extension.
+    """
+    existing_paths = []
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            existing_paths.append(file_path)
         else:
             log_error(f"File not found for upload: {file_path}")
+    if not existing_paths:
+        return
 
-    def upload_content(content: Union[str, Dict[str, Any], List[Any], None], minio_path: str) -> None:
-        """
-        Helper function to upload string content (or JSON-serializable content) to Minio.
-
-        Args:
-            content (Union[str, Dict[str, Any], List[Any], None]): The string content or
-                                                                    JSON-serializable object to be uploaded.
-            minio_path (str): The destination path for the content within the Minio bucket.
-        """
-        if content is None:
-            return
-        
-        # If content is a dict or list, assume it's JSON and serialize it
-        if isinstance(content, (dict, list)):
-            content_str = json.dumps(content, indent=2, ensure_ascii=False)
-            content_bytes = content_str.encode('utf-8')
-        elif isinstance(content, str):
-            content_bytes = content.encode('utf-8')
+    try:
+        buffer = BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            for file_path in existing_paths:
+                tar.add(file_path, arcname=os.path.basename(file_path))
+
+        if COMPRESS_ARTIFACTS:
+            minio_path += ".tar.zst"
+            upload_compressed(MINIO_BUCKET, minio_path, buffer.getvalue(), content_type="application/x-tar")
         else:
-            log_error(f"Unsupported content type for upload to {minio_path}: {type(content)}")
-            return
+            minio_path += ".tar"
+            upload(MINIO_BUCKET, minio_path, buffer.getvalue(), content_type="application/x-tar")
+        print(f"Uploaded {len(existing_paths)} files as archive to Minio path: {minio_path}")
+    except Exception as e:
+        log_error(f"Failed to upload archive to {minio_path}: {e}")
 
-        try:
-            upload(bucket_name, minio_path, content_bytes)
-            print(f"Uploaded content to Minio path: {minio_path}")
-        except Exception as e:
-            log_error(f"Failed to upload content to {minio_path}: {e}")
+def _deduplicate_file_uploads(uploads: List[Tuple[Callable[[Any, str], None], Any, str]]
+                              ) -> Tuple[List[Tuple[Callable[[Any, str], None], Any, str]], List[Tuple[str, str]]]:
+    """
+    Finds file uploads whose content is identical to another file of the same run, so each
+    distinct content is transferred once and the duplicates are copied server-side afterwards.
+    Files are compared by size first and only hashed when their sizes collide.
+
+    Args:
+        uploads (List[Tuple[Callable[[Any, str], None], Any, str]]): The collected uploads as
+            (upload function, file path or content, Minio path).
+
+    Returns:
+        Tuple[List[Tuple[Callable[[Any, str], None], Any, str]], List[Tuple[str, str]]]:
+            The uploads to perform, and the (source object path, destination object path)
+            copies to make once they have finished.
+    """
+    by_size: Dict[int, List[int]] = {} # File size -> indices of the file uploads in `uploads`
+    for index, (upload_func, source, _) in enumerate(uploads):
+        if upload_func is _upload_file and source and os.path.exists(source):
+            by_size.setdefault(os.path.getsize(source), []).append(index)
+
+    duplicates = set() # Indices of the uploads replaced by copies
+    copies: List[Tuple[str, str]] = []
+    for candidates in by_size.values():
+        if len(candidates) < 2:
+            continue
+        first_seen: Dict[Tuple[str, bool], str] = {}
+        for index in candidates:
+            _, file_path, minio_path = uploads[index]
+            digest = file_digest(file_path, "blake2b")
+            object_path = _object_path(file_path, minio_path)
+            # Compressed and uncompressed objects of the same content are different objects
+            key = (digest, object_path != minio_path)
+            if key in first_seen:
+                # The same file uploaded to the same path twice needs neither a second upload nor a copy
+                if first_seen[key] != object_path:
+                    copies.append((first_seen[key], object_path))
+                duplicates.add(index)
+            else:
+                first_seen[key] = object_path
 
-    # --- Artifact Upload Process ---
+    unique_uploads = [task for index, task in enumerate(uploads) if index not in duplicates]
+    return unique_uploads, copies
+
+def _copy_object(source_path: str, minio_path: str) -> None:
+    """
+    Stores a duplicate artifact by copying the already uploaded object server-side.
+
+    Args:
+        source_path (str): The path of the uploaded object with the same content.
+        minio_path (str): The destination path within the Minio bucket.
+    """
+    try:
+        copy(MINIO_BUCKET, source_path, minio_path)
+        print(f"Copied identical content from Minio path: {source_path} to {minio_path}")
+    except Exception as e:
+        log_error(f"Failed to copy {source_path} to {minio_path}: {e}")
+
+def run(ctx: Dict[str, Any]) -> None:
+    """
+    Executes the Upload Artifacts step. This function collects all relevant data and
+    files stored in the pipeline context and uploads each artifact to the configured
+    Minio bucket under a directory specific to the current run ID. The uploads are
+    independent network round trips, so they run concurrently.
+
+    Args:
+        ctx (Dict[str, Any]): The pipeline context dictionary containing paths
+                              or content of all generated artifacts.
+    """
+    run_id = ctx["run_id"]
+    # Uploads to perform: (upload function, file path or content, Minio path)
+    uploads: List[Tuple[Callable[[Any, str], None], Any, str]] = []
+
+    # --- Collect Artifact Uploads ---
 
     # 1. Original Checklist (raw text)
-    upload_content(ctx.get("txt"), f"{run_id}/original_checklist.txt")
+    uploads.append((_upload_content, ctx.get("txt"), f"{run_id}/original_checklist.txt"))
 
     # 2. Scenarios (generated text)
-    upload_content(ctx.get("scenarios"), f"{run_id}/scenarios.txt")
+    uploads.append((_upload_content, ctx.get("scenarios"), f"{run_id}/scenarios.txt"))
 
     # 3. Test Cases (JSON object)
-    # testcases_json is already a list of dicts, so upload_content can handle it.
-    upload_content(ctx.get("testcases_json"), f"{run_id}/testcases.json")
+    # testcases_json is already a list of dicts, so _upload_content can handle it.
+    uploads.append((_upload_content, ctx.get("testcases_json"), f"{run_id}/testcases.json"))
 
-    # 4. Autotest files (individual Python files)
-    for file_path in ctx.get("autotest_files", []):
-        filename = os.path.basename(file_path)
-        upload_file(file_path, f"{run_id}/autotests/{filename}")
-    
-    # Upload conftest.py if it exists
+    # 4. Autotest files (Python files, archived together as a single object)
+    autotest_files = list(ctx.get("autotest_files") or ())
+    # Include conftest.py if it exists
     autotests_dir = ctx.get("autotests_dir")
     if autotests_dir:
         conftest_path = os.path.join(autotests_dir, "conftest.py")
         if os.path.exists(conftest_path):
-            upload_file(conftest_path, f"{run_id}/autotests/conftest.py")
+            autotest_files.append(conftest_path)
+    if autotest_files:
+        uploads.append((_upload_archive, autotest_files, f"{run_id}/autotests"))
 
     # 5. Code Quality Report (text file)
-    upload_file(ctx.get("code_quality_report"), f"{run_id}/reports/code_quality_report.txt")
+    uploads.append((_upload_file, ctx.get("code_quality_report"), f"{run_id}/reports/code_quality_report.txt"))
     
     # 6. AI Code Reviews (JSON/text files)
-    for review_path in ctx.get("ai_code_reviews", []):
-        filename = os.path.basename(review_path)
-        upload_file(review_path, f"{run_id}/reports/{filename}")
+    basename = os.path.basename
+    uploads.extend(
+        (_upload_file, review_path, f"{run_id}/reports/{basename(review_path)}")
+        for review_path in ctx.get("ai_code_reviews") or ()
+    )
 
     # 7. Test Results (XML and Log files)
     # Note: ctx.get("test_results") is not set in run_autotests.py, it sets test_results_xml
-    upload_file(ctx.get("test_results_xml"), f"{run_id}/reports/test_results.xml")
-    upload_file(ctx.get("test_run_log"), f"{run_id}/reports/test_run.log") # Corrected filename based on run_autotests.py
-    upload_file(ctx.get("test_report_html"), f"{run_id}/reports/test_report.html") # HTML report
+    uploads.append((_upload_file, ctx.get("test_results_xml"), f"{run_id}/reports/test_results.xml"))
+    uploads.append((_upload_file, ctx.get("test_run_log"), f"{run_id}/reports/test_run.log")) # Corrected filename based on run_autotests.py
+    uploads.append((_upload_file, ctx.get("test_report_html"), f"{run_id}/reports/test_report.html")) # HTML report
 
     # 8. QA Summary Report (text file)
-    upload_file(ctx.get("qa_summary_report"), f"{run_id}/reports/qa_summary.txt")
+    uploads.append((_upload_file, ctx.get("qa_summary_report"), f"{run_id}/reports/qa_summary.txt"))
 
     # 9. Bug Report (JSON file or raw text if parsing failed)
-    upload_file(ctx.get("bug_report"), f"{run_id}/reports/{os.path.basename(ctx.get('bug_report', 'bug_report.json'))}")
+    bug_report_path = ctx.get("bug_report")
+    bug_report_name = basename(bug_report_path) if bug_report_path else "bug_report.json"
+    uploads.append((_upload_file, bug_report_path, f"{run_id}/reports/{bug_report_name}"))
+
+    # Files with the same content as another file of the run are uploaded once
+    uploads, copies = _deduplicate_file_uploads(uploads)
+
+    # Run the uploads concurrently; each upload logs its own failure, so one failed
+    # artifact doesn't stop the others
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_CONCURRENCY, len(uploads) or 1)) as executor:
+        futures = [executor.submit(upload_func, source, minio_path) for upload_func, source, minio_path in uploads]
+        for future in as_completed(futures):
+            future.result()
+        # The duplicates are copied from the uploaded objects once those exist
+        futures = [executor.submit(_copy_object, source_path, minio_path) for source_path, minio_path in copies]
+        for future in as_completed(futures):
+            future.result()
 
     print(f"✅ Finished uploading all available artifacts for run_id {run_id} to Minio.")
@@ -0,0 +1,21 @@
+"""
+This module holds the Minio connection settings, read from environment variables once at import.
+The Minio client and the setup script both take their settings from here, so they can't
+interpret the same variable differently.
+"""
+import os
+from typing import Optional
+
+# MINIO_ENDPOINT: The host (and optional port) of the Minio server, e.g. "minio:9000".
+MINIO_ENDPOINT: Optional[str] = os.getenv("MINIO_ENDPOINT")
+# MINIO_ACCESS_KEY / MINIO_SECRET_KEY: The credentials for Minio authentication.
+MINIO_ACCESS_KEY: Optional[str] = os.getenv("MINIO_ACCESS_KEY")
+MINIO_SECRET_KEY: Optional[str] = os.getenv("MINIO_SECRET_KEY")
+# MINIO_SECURE: Whether to connect over HTTPS ("true", "1", "yes" or "on", case-insensitive); HTTP otherwise.
+MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "false").strip().lower() in ("1", "true", "yes", "on")
+# MINIO_BUCKET: Default bucket for pipeline inputs, artifacts and contexts.
+MINIO_BUCKET: str = os.getenv("MINIO_BUCKET", "qa-pipeline")
+# MINIO_MAX_CONNECTIONS: Number of keep-alive connections the client keeps per host. It should cover the
+# uploads in flight at once (UPLOAD_CONCURRENCY artifacts, each sending up to MINIO_PART_CONCURRENCY parts);
+# connections beyond it are still opened when needed, but closed instead of reused.
+MINIO_MAX_CONNECTIONS: int = max(1, int(os.getenv("MINIO_MAX_CONNECTIONS", "32")))
@@ -1,94 +1,392 @@
 """
 This module provides a client for interacting with Minio object storage.
 It encapsulates common operations such as uploading and downloading files,
-and specifically handles JSON serialization/deserialization for context management.
+and specifically handles JSON serialization/deserialization and Zstandard compression for context management.
 """
 import os
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import certifi
+import orjson
+import urllib3
+import zstandard
 from minio import Minio
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 from io import BytesIO
-from utils.exceptions import StorageError
-from typing import Dict, Any, Union
-
-# Initialize the Minio client using environment variables for configuration.
-# These variables should be set in the .env file or the environment where the application runs.
-# MINIO_ENDPOINT: The URL of the Minio server.
-# MINIO_ACCESS_KEY: The access key for Minio authentication.
-# MINIO_SECRET_KEY: The secret key for Minio authentication.
-# MINIO_SECURE: 'True' for HTTPS connection, 'False' for HTTP.
-client: Minio = Minio(
-    os.getenv("MINIO_ENDPOINT"),
-    access_key=os.getenv("MINIO_ACCESS_KEY"),
-    secret_key=os.getenv("MINIO_SECRET_KEY"),
-    secure=os.getenv("MINIO_SECURE", "False").lower() == 'true' # Default to False if not explicitly 'True'
+from storage.config import (
+    MINIO_ACCESS_KEY, MINIO_BUCKET, MINIO_ENDPOINT, MINIO_MAX_CONNECTIONS, MINIO_SECRET_KEY, MINIO_SECURE
 )
+from utils.exceptions import StorageError
+from utils.files import file_digest
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+
+# The Minio client is configured from the environment variables resolved in storage.config.
+# The client uses one keep-alive connection pool sized for concurrent access (worker threads,
+# download_many) by MINIO_MAX_CONNECTIONS; the default pool keeps only 10 connections and
+# discards the rest after use.
+
+# The process-wide client, created on first use by get_client()
+_client: Optional[Minio] = None
+_client_lock = threading.Lock()
+
+def get_client() -> Minio:
+    """
+    Returns the process-wide Minio client, creating it on first use. Every storage operation
+    goes through this one client, so all callers share a single keep-alive connection pool,
+    and importing this module doesn't construct a client that may never be used.
+
+    Returns:
+        Minio: The shared Minio client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Minio(
+                    MINIO_ENDPOINT,
+                    access_key=MINIO_ACCESS_KEY,
+                    secret_key=MINIO_SECRET_KEY,
+                    secure=MINIO_SECURE,
+                    http_client=urllib3.PoolManager(
+                        num_pools=4,
+                        maxsize=MINIO_MAX_CONNECTIONS,
+                        timeout=urllib3.Timeout(connect=10, read=300),
+                        # Verify HTTPS certificates like the client's default pool does
+                        cert_reqs="CERT_REQUIRED",
+                        ca_certs=os.getenv("SSL_CERT_FILE") or certifi.where(),
+                        retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+                    ),
+                )
+    return _client
+
+# Zstandard compression level for compressed uploads (3 is the library default: fast with a good ratio).
+ZSTD_COMPRESSION_LEVEL: int = 3
+# Every Zstandard frame starts with these bytes; used to recognize compressed objects on download.
+ZSTD_MAGIC: bytes = b"\x28\xb5\x2f\xfd"
+
+# Multipart settings for large uploads: objects larger than one part are split into parts of
+# MINIO_PART_SIZE bytes (S3 requires at least 5 MiB), uploaded MINIO_PART_CONCURRENCY at a time.
+MINIO_MIN_PART_SIZE: int = 5 * 1024 * 1024
+MINIO_PART_SIZE: int = max(MINIO_MIN_PART_SIZE, int(os.getenv("MINIO_PART_SIZE", str(16 * 1024 * 1024))))
+MINIO_PART_CONCURRENCY: int = max(1, int(os.getenv("MINIO_PART_CONCURRENCY", "4")))
+
+# User metadata key holding the MD5 of the uploaded local file. The object's ETag can't be compared
+# with the file directly: it differs for compressed objects and is not an MD5 for multipart uploads.
+SOURCE_MD5_METADATA: str = "Source-MD5"
+
+# Maximum number of concurrent GET requests issued by download_many.
+DOWNLOAD_MANY_MAX_WORKERS: int = 8
+
+# Buckets already known to exist, so uploads don't pay a bucket_exists round trip every time.
+# The lock is only contended until each bucket has been checked once.
+_known_buckets: set[str] = set()
+# Error codes make_bucket fails with when the bucket is already there
+BUCKET_EXISTS_ERROR_CODES = frozenset({"BucketAlreadyOwnedByYou", "BucketAlreadyExists"})
+_known_buckets_lock = threading.Lock()
+
+def _ensure_bucket(bucket: str) -> None:
+    """
+    Creates a bucket if it does not exist yet. The check is made once per bucket
+    for the lifetime of the process; later calls return without a request.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+
+    Raises:
+        S3Error: If the bucket cannot be checked or created.
+    """
+    if bucket in _known_buckets:
+        return
+    with _known_buckets_lock:
+        if bucket not in _known_buckets:
+            client = get_client()
+            # Creating the bucket directly is one round trip instead of a check plus a create,
+            # and has no window in which another process can create it in between
+            try:
+                client.make_bucket(bucket)
+            except S3Error as e:
+                # Credentials without the CreateBucket permission still work with an existing bucket
+                if e.code not in BUCKET_EXISTS_ERROR_CODES and not client.bucket_exists(bucket):
+                    raise
+            _known_buckets.add(bucket)
 
-def upload(bucket: str, path: str, content: bytes) -> None:
+def upload(bucket: str, path: str, content: bytes, content_type: str = "application/octet-stream",
+           metadata: Optional[Dict[str, str]] = None) -> None:
     """
     Uploads raw byte content to a specified path within a Minio bucket.
+    Content larger than MINIO_PART_SIZE is sent as a multipart upload with parts in parallel.
     If the bucket does not exist, it will be created.
 
     Args:
         bucket (str): The name of the Minio bucket.
         path (str): The object path within the bucket (e.g., "folder/file.txt").
         content (bytes): The byte content to be uploaded.
+        content_type (str): The MIME type stored with the object. Defaults to "application/octet-stream".
+        metadata (Optional[Dict[str, str]]): Additional headers/metadata stored with the object. Defaults to None.
 
     Raises:
         StorageError: If the upload operation fails due to an S3 error.
     """
     try:
-        # Check if bucket exists, create if not
-        if not client.bucket_exists(bucket):
-            client.make_bucket(bucket)
+        # Create the bucket on first use
+        _ensure_bucket(bucket)
         # Upload the content
-        client.put_object(bucket, path, data=BytesIO(content), length=len(content))
+        get_client().put_object(
+            bucket, path, data=BytesIO(content), length=len(content), content_type=content_type, metadata=metadata,
+            part_size=MINIO_PART_SIZE, num_parallel_uploads=MINIO_PART_CONCURRENCY
+        )
     except S3Error as e:
         raise StorageError(f"Failed to upload to Minio bucket '{bucket}', path '{path}': {e}") from e
 
 
-def download(bucket: str, path: str) -> str:
+def _is_uploaded(bucket: str, path: str, source_md5: str) -> bool:
     """
-    Downloads content from a specified path within a Minio bucket as a UTF-8 decoded string.
+    Checks whether an object was uploaded from a file with the given MD5, using the
+    metadata stored by upload_file / upload_file_compressed.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket.
+        source_md5 (str): The MD5 hex digest of the local file.
+
+    Returns:
+        bool: True if the object exists and holds the same file content, False otherwise.
+    """
+    try:
+        stat = get_client().stat_object(bucket, path)
+    except S3Error: # The object (or bucket) doesn't exist yet
+        return False
+    return (stat.metadata or {}).get(f"x-amz-meta-{SOURCE_MD5_METADATA}") == source_md5
+
+
+def upload_file(bucket: str, path: str, file_path: str, content_type: str = "application/octet-stream",
+                skip_unchanged: bool = False) -> bool:
+    """
+    Uploads a local file to a specified path within a Minio bucket, streaming it from disk
+    (in parallel multipart chunks for large files) instead of loading it into memory first.
+    If the bucket does not exist, it will be created.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket (e.g., "folder/file.txt").
+        file_path (str): The local path of the file to upload.
+        content_type (str): The MIME type stored with the object. Defaults to "application/octet-stream".
+        skip_unchanged (bool): Whether to skip the upload if the object already holds the same file content
+                               (compared by the MD5 stored in the object's metadata). Defaults to False.
+
+    Returns:
+        bool: True if the file was uploaded, False if it was skipped as unchanged.
+
+    Raises:
+        StorageError: If the upload operation fails due to an S3 error.
+    """
+    try:
+        source_md5 = file_digest(file_path, "md5")
+        if skip_unchanged and _is_uploaded(bucket, path, source_md5):
+            return False
+        # Create the bucket on first use
+        _ensure_bucket(bucket)
+        get_client().fput_object(
+            bucket, path, file_path, content_type=content_type, metadata={SOURCE_MD5_METADATA: source_md5},
+            part_size=MINIO_PART_SIZE, num_parallel_uploads=MINIO_PART_CONCURRENCY
+        )
+        return True
+    except S3Error as e:
+        raise StorageError(f"Failed to upload file '{file_path}' to Minio bucket '{bucket}', path '{path}': {e}") from e
+
+def copy(bucket: str, source_path: str, path: str) -> None:
+    """
+    Copies an object to another path within the same Minio bucket. The copy is made server-side,
+    so no content is transferred from the client; metadata is copied along with the content.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        source_path (str): The path of the object to copy.
+        path (str): The destination path within the bucket.
+
+    Raises:
+        StorageError: If the copy operation fails due to an S3 error or if the source object does not exist.
+    """
+    try:
+        get_client().copy_object(bucket, path, CopySource(bucket, source_path))
+    except S3Error as e:
+        raise StorageError(f"Failed to copy '{source_path}' to '{path}' in Minio bucket '{bucket}': {e}") from e
+
+def download_bytes(bucket: str, path: str) -> bytes:
+    """
+    Downloads the raw byte content of an object from a specified path within a Minio bucket.
 
     Args:
         bucket (str): The name of the Minio bucket.
         path (str): The object path within the bucket to download.
 
     Returns:
-        str: The decoded string content of the downloaded object.
+        bytes: The raw content of the downloaded object.
 
     Raises:
         StorageError: If the download operation fails due to an S3 error or if the object does not exist.
     """
+    response = None
     try:
-        # Get the object from Minio
-        response = client.get_object(bucket, path)
-        # Read and decode the content
-        return response.read().decode('utf-8')
+        # Get the object from Minio and read its content
+        response = get_client().get_object(bucket, path)
+        return response.read()
     except S3Error as e:
         raise StorageError(f"Failed to download from Minio bucket '{bucket}', path '{path}': {e}") from e
+    finally:
+        # Return the connection to the pool
+        if response is not None:
+            response.close()
+            response.release_conn()
+
+
+def get_etag(bucket: str, path: str) -> str:
+    """
+    Retrieves the ETag of an object without downloading its content. The ETag changes whenever
+    the object is overwritten with different content.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket.
+
+    Returns:
+        str: The ETag of the object.
+
+    Raises:
+        StorageError: If the stat operation fails due to an S3 error or if the object does not exist.
+    """
+    try:
+        return get_client().stat_object(bucket, path).etag
+    except S3Error as e:
+        raise StorageError(f"Failed to stat Minio bucket '{bucket}', path '{path}': {e}") from e
+
+
+def upload_compressed(bucket: str, path: str, content: bytes, content_type: str = "application/octet-stream") -> None:
+    """
+    Compresses byte content with Zstandard and uploads it to a specified path within a Minio bucket.
+    The object is tagged with 'Content-Encoding: zstd'.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket.
+        content (bytes): The uncompressed byte content to be uploaded.
+        content_type (str): The MIME type of the uncompressed content. Defaults to "application/octet-stream".
+
+    Raises:
+        StorageError: If the upload operation fails due to an S3 error.
+    """
+    upload(
+        bucket, path, zstandard.compress(content, ZSTD_COMPRESSION_LEVEL),
+        content_type=content_type, metadata={"Content-Encoding": "zstd"}
+    )
+
+
+def upload_file_compressed(bucket: str, path: str, file_path: str,
+                           content_type: str = "application/octet-stream", skip_unchanged: bool = False) -> bool:
+    """
+    Compresses a local file with Zstandard while streaming it to a specified path within a Minio bucket.
+    The file is compressed on the fly as parts are sent, so neither the file nor its compressed form
+    is held in memory. The object is tagged with 'Content-Encoding: zstd'.
+    If the bucket does not exist, it will be created.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket.
+        file_path (str): The local path of the file to compress and upload.
+        content_type (str): The MIME type of the uncompressed content. Defaults to "application/octet-stream".
+        skip_unchanged (bool): Whether to skip the upload if the object already holds the same file content
+                               (compared by the MD5 stored in the object's metadata). Defaults to False.
+
+    Returns:
+        bool: True if the file was uploaded, False if it was skipped as unchanged.
+
+    Raises:
+        StorageError: If the upload operation fails due to an S3 error.
+    """
+    try:
+        source_md5 = file_digest(file_path, "md5")
+        if skip_unchanged and _is_uploaded(bucket, path, source_md5):
+            return False
+        # Create the bucket on first use
+        _ensure_bucket(bucket)
+        with open(file_path, "rb") as f:
+            # A compressor instance is not thread-safe, so each upload gets its own
+            reader = zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).stream_reader(f)
+            # The compressed size is unknown up front (length=-1), so the object is sent in parts
+            get_client().put_object(
+                bucket, path, data=reader, length=-1, content_type=content_type,
+                metadata={"Content-Encoding": "zstd", SOURCE_MD5_METADATA: source_md5},
+                part_size=MINIO_PART_SIZE, num_parallel_uploads=MINIO_PART_CONCURRENCY
+            )
+        return True
+    except S3Error as e:
+        raise StorageError(f"Failed to upload file '{file_path}' to Minio bucket '{bucket}', path '{path}': {e}") from e
+
 
-def upload_json(bucket: str, path: str, data_dict: Dict[str, Any]) -> None:
+def download_decompressed(bucket: str, path: str) -> bytes:
+    """
+    Downloads an object from a Minio bucket, transparently decompressing it if it is
+    Zstandard-compressed (detected by the frame magic bytes). Uncompressed objects are returned as-is.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket to download.
+
+    Returns:
+        bytes: The uncompressed content of the object.
+
+    Raises:
+        StorageError: If the download operation fails due to an S3 error or if the object does not exist.
+    """
+    content = download_bytes(bucket, path)
+    if content.startswith(ZSTD_MAGIC):
+        return zstandard.decompress(content)
+    return content
+
+
+def download(bucket: str, path: str) -> str:
+    """
+    Downloads content from a specified path within a Minio bucket as a UTF-8 decoded string.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket to download.
+
+    Returns:
+        str: The decoded string content of the downloaded object.
+
+    Raises:
+        StorageError: If the download operation fails due to an S3 error or if the object does not exist.
+    """
+    return download_bytes(bucket, path).decode('utf-8')
+
+def upload_json(bucket: str, path: str, data_dict: Dict[str, Any], compress: bool = False) -> None:
     """
     Uploads a Python dictionary as a JSON file to a specified path within a Minio bucket.
-    The dictionary is serialized to a JSON string and then encoded to bytes.
+    The dictionary is serialized directly to UTF-8 JSON bytes with orjson.
 
     Args:
         bucket (str): The name of the Minio bucket.
         path (str): The object path within the bucket where the JSON file will be stored.
         data_dict (Dict[str, Any]): The dictionary to be serialized and uploaded.
+        compress (bool): Whether to compress the JSON with Zstandard. Defaults to False.
 
     Raises:
         StorageError: If the upload operation fails.
     """
-    json_bytes = json.dumps(data_dict, ensure_ascii=False, indent=2).encode('utf-8')
-    upload(bucket, path, json_bytes)
+    if compress:
+        # Indentation only adds bytes to compress when the file isn't meant to be read directly
+        upload_compressed(bucket, path, orjson.dumps(data_dict), content_type="application/json")
+    else:
+        upload(bucket, path, orjson.dumps(data_dict, option=orjson.OPT_INDENT_2), content_type="application/json")
 
 def download_json(bucket: str, path: str) -> Dict[str, Any]:
     """
     Downloads a JSON file from a specified path within a Minio bucket and
-    deserializes it into a Python dictionary.
+    deserializes it into a Python dictionary. Zstandard-compressed files are decompressed first.
 
     Args:
         bucket (str): The name of the Minio bucket.
@@ -99,7 +397,90 @@ def download_json(bucket: str, path: str) -> Dict[str, Any]:
 
     Raises:
         StorageError: If the download operation fails.
-        json.JSONDecodeError: If the downloaded content is not valid JSON.
+        orjson.JSONDecodeError: If the downloaded content is not valid JSON.
     """
-    content = download(bucket, path)
-    return json.loads(content)
\ No newline at end of file
+    return orjson.loads(download_decompressed(bucket, path))
+
+def download_many(bucket: str, paths: List[str]) -> Dict[str, bytes]:
+    """
+    Downloads several objects from a Minio bucket concurrently, so the total latency is
+    close to that of a single round trip instead of one round trip per object.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        paths (List[str]): The object paths within the bucket to download.
+
+    Returns:
+        Dict[str, bytes]: A mapping of each object path to its raw content.
+
+    Raises:
+        StorageError: If any of the downloads fails.
+    """
+    if not paths:
+        return {}
+    # The Minio client is thread-safe and pools its HTTP connections, so one client serves all workers
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_MANY_MAX_WORKERS, len(paths))) as executor:
+        contents = executor.map(lambda path: download_bytes(bucket, path), paths)
+        return dict(zip(paths, contents))
+
+def delete(bucket: str, path: str) -> None:
+    """
+    Deletes an object from a specified path within a Minio bucket.
+    Deleting an object that does not exist is not an error.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        path (str): The object path within the bucket to delete.
+
+    Raises:
+        StorageError: If the delete operation fails due to an S3 error.
+    """
+    try:
+        get_client().remove_object(bucket, path)
+    except S3Error as e:
+        raise StorageError(f"Failed to delete from Minio bucket '{bucket}', path '{path}': {e}") from e
+
+
+def delete_many(bucket: str, paths: List[str]) -> None:
+    """
+    Deletes several objects from a Minio bucket using batched S3 DeleteObjects requests
+    (up to 1000 objects per request) instead of one request per object.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        paths (List[str]): The object paths within the bucket to delete.
+
+    Raises:
+        StorageError: If any of the objects could not be deleted.
+    """
+    if not paths:
+        return
+    try:
+        # remove_objects is lazy: errors are only reported while iterating the result
+        errors = list(get_client().remove_objects(bucket, [DeleteObject(path) for path in paths]))
+    except S3Error as e:
+        raise StorageError(f"Failed to delete objects from Minio bucket '{bucket}': {e}") from e
+    if errors:
+        failed = ", ".join(error.name for error in errors)
+        raise StorageError(f"Failed to delete objects from Minio bucket '{bucket}': {failed}")
+
+
+def list_objects(bucket: str, prefix: str) -> Iterator[Tuple[str, datetime]]:
+    """
+    Lists the objects under a prefix within a Minio bucket, recursively.
+
+    Args:
+        bucket (str): The name of the Minio bucket.
+        prefix (str): The path prefix to list (e.g., "contexts/").
+
+    Yields:
+        Tuple[str, datetime]: The path and last-modified time of each object.
+
+    Raises:
+        StorageError: If the list operation fails due to an S3 error.
+    """
+    try:
+        for obj in get_client().list_objects(bucket, prefix=prefix, recursive=True):
+            yield obj.object_name, obj.last_modified
+    except S3Error as e:
+        raise StorageError(f"Failed to list Minio bucket '{bucket}', prefix '{prefix}': {e}") from e
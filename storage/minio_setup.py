@@ -3,42 +3,55 @@ This module provides a setup script for the Minio object storage.
 It ensures that the application can connect to the Minio server and that
 the default bucket required for artifact storage exists, with retry logic for robustness.
 """
-import os
+import socket
 import time
-from minio import Minio
+from urllib.parse import urlsplit
 from minio.error import S3Error
+from storage.config import MINIO_BUCKET, MINIO_ENDPOINT, MINIO_SECURE
+from storage.minio_client import BUCKET_EXISTS_ERROR_CODES, get_client
 
 # Maximum number of attempts to connect to Minio before giving up.
-MAX_RETRIES = 10
-# Delay in seconds between connection retry attempts.
-RETRY_DELAY = 5 # seconds
+MAX_RETRIES = 15
+# Delay in seconds before the first retry; it doubles after every failed attempt up to RETRY_MAX_DELAY.
+# Minio is usually up within a second, so short first delays avoid idling, while the cap keeps the
+# total waiting time (about a minute) comparable to a fixed 5 second delay.
+RETRY_INITIAL_DELAY = 0.2 # seconds
+RETRY_MAX_DELAY = 5.0 # seconds
+# Timeout in seconds of the TCP probe made before each attempt.
+PROBE_TIMEOUT = 2 # seconds
+
+def _probe_endpoint() -> None:
+    """
+    Opens and closes a TCP connection to the Minio endpoint. While the server is still starting,
+    this fails immediately, instead of going through the client's HTTP retries on every attempt.
+
+    Raises:
+        OSError: If the endpoint does not accept connections.
+    """
+    endpoint = urlsplit("//" + (MINIO_ENDPOINT or ""))
+    port = endpoint.port or (443 if MINIO_SECURE else 80)
+    socket.create_connection((endpoint.hostname, port), timeout=PROBE_TIMEOUT).close()
 
 def main() -> None:
     """
-    Initializes the Minio client, waits for the Minio server to become available,
+    Obtains the shared Minio client, waits for the Minio server to become available,
     and ensures that the configured bucket exists. If the bucket does not exist,
     it attempts to create it. Exits with an error if connection or bucket creation fails.
     """
-    bucket_name = os.getenv("MINIO_BUCKET", "qa-pipeline")
-    
-    # Determine if secure (HTTPS) connection is required based on environment variable
-    secure_str = os.getenv("MINIO_SECURE", "false").lower()
-    secure = secure_str == "true"
+    bucket_name = MINIO_BUCKET
 
-    # Initialize Minio client
-    client = Minio(
-        os.getenv("MINIO_ENDPOINT"),
-        access_key=os.getenv("MINIO_ACCESS_KEY"),
-        secret_key=os.getenv("MINIO_SECRET_KEY"),
-        secure=secure
-    )
+    # Use the application's Minio client, so setup shares its connection settings
+    # (TLS verification, pool, timeouts) instead of configuring a second client
+    client = get_client()
 
     # --- Connection Retry Logic ---
     print("Connecting to Minio...")
     retries = 0
+    delay = RETRY_INITIAL_DELAY
     while retries < MAX_RETRIES:
         try:
-            # Perform a simple operation to check connectivity (e.g., list buckets)
+            # Check that the port is open, then that the server answers authenticated requests
+            _probe_endpoint()
             client.list_buckets()
             print("Successfully connected to Minio.")
             break # Exit loop if connection is successful
@@ -48,17 +61,22 @@ def main() -> None:
             if retries >= MAX_RETRIES:
                 print(f"Error: Could not connect to Minio after {MAX_RETRIES} attempts. {e}")
                 exit(1) # Exit with error code if max retries reached
-            time.sleep(RETRY_DELAY) # Wait before retrying
+            time.sleep(delay) # Wait before retrying
+            delay = min(delay * 2, RETRY_MAX_DELAY)
 
     # --- Bucket Creation/Verification ---
     try:
-        if not client.bucket_exists(bucket_name):
-            print(f"Bucket '{bucket_name}' not found. Creating it...")
-            client.make_bucket(bucket_name)
-            print(f"Bucket '{bucket_name}' created successfully.")
-        else:
-            print(f"Bucket '{bucket_name}' already exists.")
+        # Create the bucket directly; the "already exists" error replaces a separate existence check
+        client.make_bucket(bucket_name)
+        print(f"Bucket '{bucket_name}' created successfully.")
     except S3Error as e:
+        try:
+            # Credentials without the CreateBucket permission still work with an existing bucket
+            if e.code in BUCKET_EXISTS_ERROR_CODES or client.bucket_exists(bucket_name):
+                print(f"Bucket '{bucket_name}' already exists.")
+                return
+        except S3Error as check_error:
+            e = check_error
         print(f"Error interacting with bucket '{bucket_name}': {e}")
         exit(1) # Exit with error code if bucket operation fails
 
@@ -0,0 +1,31 @@
+"""
+This module contains unit tests for the LLM response cleanup and batching helpers in `pipeline.steps.generate_testcases`.
+"""
+import orjson
+from pipeline.steps.generate_testcases import _extract_json_obj, _group_scenarios, _make_test_ids_unique, _scenario_blocks
+
+
+def test_extract_json_obj_strips_comments_outside_strings():
+    text = (
+        'Here are the test cases:\n'
+        '{"testcases": [ // generated\n'
+        '  {"url": "https://example.com/a//b", "note": "say \\"// hi\\""} // first\n'
+        ']}\nDone.'
+    )
+    parsed = orjson.loads(_extract_json_obj(text))
+    assert parsed == {"testcases": [{"url": "https://example.com/a//b", "note": 'say "// hi"'}]}
+
+
+def test_group_scenarios_keeps_scenarios_whole_and_in_order():
+    blocks = [f"Scenario {i}" + "\nstep" * 100 for i in range(8)]
+    assert _scenario_blocks("\n\n".join(blocks)) == blocks
+    groups = _group_scenarios(blocks, 4)
+    assert len(groups) == 4
+    assert [block for group in groups for block in group] == blocks
+    assert _group_scenarios(["Scenario 1", "Scenario 2"], 4) == [["Scenario 1", "Scenario 2"]]
+
+
+def test_make_test_ids_unique_renames_later_duplicates():
+    testcases = [{"test_id": "TC-001"}, {"test_id": "TC-002"}, {"test_id": "TC-001"}]
+    _make_test_ids_unique(testcases)
+    assert [tc["test_id"] for tc in testcases] == ["TC-001", "TC-002", "TC-001-2"]
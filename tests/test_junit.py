@@ -0,0 +1,26 @@
+"""
+This module contains unit tests for the JUnit XML summary helper in `utils.junit`.
+"""
+from utils.junit import summarize_junit
+
+
+def test_summarize_junit_counts_and_failures(tmp_path):
+    report = tmp_path / "results.xml"
+    report.write_text(
+        '<testsuites><testsuite name="pytest">'
+        '<testcase classname="test_a" name="test_ok"/>'
+        '<testcase classname="test_a" name="test_bad"><failure message="assert 1 == 2">trace</failure></testcase>'
+        '<testcase classname="test_b" name="test_err"><error message="boom"/></testcase>'
+        '<testcase classname="test_b" name="test_skip"><skipped/></testcase>'
+        '</testsuite></testsuites>',
+        encoding="utf-8",
+    )
+    summary = summarize_junit(str(report), max_failures=1)
+    assert summary.splitlines()[0] == "Tests: 4, passed: 1, failed: 1, errors: 1, skipped: 1"
+    assert "- test_a::test_bad [failure]: assert 1 == 2" in summary
+    assert "test_err" not in summary
+    assert summary.endswith("... and 1 more")
+
+
+def test_summarize_junit_missing_file(tmp_path):
+    assert summarize_junit(str(tmp_path / "missing.xml")) is None
@@ -0,0 +1,21 @@
+"""
+This module contains unit tests for the LLM response helpers in `llm.utils`.
+"""
+from llm.utils import extract_json_from_llm_response, truncate_middle
+
+
+def test_extract_json_strips_fenced_block():
+    assert extract_json_from_llm_response('```json\n{"a": 1}\n```\n') == '{"a": 1}'
+    assert extract_json_from_llm_response('```\n[1, 2]\n```') == '[1, 2]'
+    assert extract_json_from_llm_response('{"a": 1}') == '{"a": 1}'
+
+
+def test_extract_json_falls_back_to_regex():
+    assert extract_json_from_llm_response('Here it is:\n```json\n{"a": 1}\n```') == 'Here it is:\n{"a": 1}'
+
+
+def test_truncate_middle_keeps_head_and_tail():
+    assert truncate_middle("short", 10) == "short"
+    truncated = truncate_middle("a" * 10 + "b" * 10, 10)
+    assert truncated.startswith("aaaaa\n") and truncated.endswith("\nbbbbb")
+    assert "[truncated 10 characters]" in truncated
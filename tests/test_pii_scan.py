@@ -3,7 +3,8 @@
 This module contains unit tests for the PII (Personally Identifiable Information) scanning
 and masking functionality implemented in `pipeline.steps.pii_scan`.
 """
-from pipeline.steps.pii_scan import run
+from types import SimpleNamespace
+from pipeline.steps.pii_scan import run, _mask_entities
 
 def test_pii_scan_with_email():
     """
@@ -38,3 +39,14 @@ def test_pii_scan_with_multiple_pii():
     ctx = {"txt": "My email is test@example.com and my password is secret123"}
     run(ctx)
     assert ctx["masked_scenarios"] == "My email is [EMAIL_MASKED] and my password is [PASSWORD_MASKED]"
+
+def test_mask_entities_prefers_longer_overlapping_span():
+    """
+    Tests that overlapping detections are masked once, using the longer span.
+    """
+    text = "login: password=abc@example.com end"
+    results = [
+        SimpleNamespace(start=16, end=31, entity_type="EMAIL_ADDRESS"),
+        SimpleNamespace(start=7, end=31, entity_type="PASSWORD"),
+    ]
+    assert _mask_entities(text, results) == "login: [PASSWORD_MASKED] end"
@@ -0,0 +1,21 @@
+"""
+This module contains unit tests for the pre-split prompt renderers in `llm.prompts`.
+"""
+from llm.prompts import bug_report, code_review
+
+def test_bug_report_render_matches_format():
+    """
+    Tests that the pre-split bug report renderer produces the same text as `str.format`.
+    """
+    testcases = '[{"id": "TC-1", "title": "Login {with} braces"}]'
+    tests = "def test_login():\n    assert True"
+    expected = bug_report.PROMPT.format(testcases=testcases, tests=tests)
+    assert bug_report.render(testcases=testcases, tests=tests) == expected
+
+def test_code_review_render_matches_format():
+    """
+    Tests that the pre-split code review renderer produces the same text as `str.format`.
+    """
+    code = "def test_login():\n    assert {'a': 1} == {'a': 1}"
+    expected = code_review.FILE_TEMPLATE.format(code=code, test_id="test_login")
+    assert code_review.render(code, "test_login") == expected
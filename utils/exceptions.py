@@ -3,14 +3,20 @@ This module defines custom exception classes used throughout the ChatOps AI QA P
 These exceptions provide more specific error handling and identification for different
 failure domains within the application, such as storage, LLM interactions, and pipeline execution.
 """
+from typing import Optional
 
 class StorageError(Exception):
     """Custom exception raised for errors related to storage operations (e.g., Minio)."""
     pass
 
 class LLMError(Exception):
-    """Custom exception raised for errors related to Large Language Model (LLM) interactions."""
-    pass
+    """
+    Custom exception raised for errors related to Large Language Model (LLM) interactions.
+    `status_code` holds the HTTP status returned by the LLM provider, if the failure had one.
+    """
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
 
 class PipelineError(Exception):
     """Custom exception raised for errors occurring during the AI QA pipeline execution."""
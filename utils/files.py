@@ -0,0 +1,100 @@
+"""
+This module provides helpers for reading the text artifacts that pipeline steps produce
+and consume (autotests, review reports, test logs and results), and for hashing artifact files.
+"""
+import atexit
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+# Maximum number of artifact files read at the same time
+READ_MAX_WORKERS = min(8, (os.cpu_count() or 4) * 2)
+# Shared pool for artifact reads, kept for the process lifetime so steps don't spawn threads on every run
+IO_POOL = ThreadPoolExecutor(max_workers=READ_MAX_WORKERS, thread_name_prefix="artifact-io")
+atexit.register(IO_POOL.shutdown, wait=False)
+# Size of the buffer a file is read into while hashing it (before Python 3.11)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def read_text(path: str) -> Optional[str]:
+    """
+    Reads a text artifact as UTF-8. A missing file is detected by the failed open
+    rather than a separate existence check; undecodable bytes are replaced.
+
+    Args:
+        path (str): The path to the artifact file.
+
+    Returns:
+        Optional[str]: The content of the file, or None if it doesn't exist.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read().decode("utf-8", "replace")
+    except FileNotFoundError:
+        return None
+
+
+def read_text_tail(path: str, max_bytes: int) -> Optional[str]:
+    """
+    Reads at most the last `max_bytes` of a text artifact. Only the tail is read from disk,
+    so large logs are never loaded whole. A truncated tail starts at the first full line.
+
+    Args:
+        path (str): The path to the artifact file.
+        max_bytes (int): The maximum number of bytes to read from the end of the file.
+
+    Returns:
+        Optional[str]: The (tail of the) content of the file, or None if it doesn't exist.
+    """
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= max_bytes:
+                return f.read().decode("utf-8", "replace")
+            f.seek(size - max_bytes)
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    # Drop the (likely partial) first line, which may also start mid-character
+    newline = data.find(b"\n")
+    if newline != -1:
+        data = data[newline + 1:]
+    return f"... [{size - len(data)} earlier bytes omitted] ...\n" + data.decode("utf-8", "replace")
+
+
+def read_texts(paths: List[str]) -> List[Optional[str]]:
+    """
+    Reads several text artifacts in parallel. The reads are independent and I/O-bound,
+    so they overlap in the shared `IO_POOL` instead of running one after another.
+
+    Args:
+        paths (List[str]): The paths to the artifact files.
+
+    Returns:
+        List[Optional[str]]: The content of each file, in the order of `paths` (None for missing files).
+    """
+    if len(paths) <= 1:
+        return [read_text(path) for path in paths]
+    return list(IO_POOL.map(read_text, paths))
+
+
+def file_digest(path: str, algorithm: str) -> str:
+    """
+    Computes the hex digest of a file. The file is read into one reusable buffer
+    (by hashlib.file_digest on Python 3.11+), so no bytes object is allocated per chunk.
+
+    Args:
+        path (str): The path to the file.
+        algorithm (str): The name of the hashlib algorithm, e.g. "md5" or "blake2b".
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, algorithm).hexdigest()
+        digest = hashlib.new(algorithm)
+        buffer = memoryview(bytearray(HASH_CHUNK_SIZE))
+        while size := f.readinto(buffer):
+            digest.update(buffer[:size])
+        return digest.hexdigest()
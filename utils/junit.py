@@ -0,0 +1,59 @@
+"""
+This module provides helpers for condensing JUnit XML test reports (as produced by
+`pytest --junitxml`) into short text summaries suitable for embedding in LLM prompts.
+"""
+import xml.etree.ElementTree as ET
+from typing import List, Optional
+
+# Maximum length of a single failure message included in the summary
+MAX_MESSAGE_LENGTH = 500
+
+def summarize_junit(path: str, max_failures: int = 50) -> Optional[str]:
+    """
+    Summarizes a JUnit XML report: test counts plus the messages of failed and errored tests.
+    The report is streamed with `iterparse` and each test case is cleared once processed,
+    so memory use doesn't grow with the size of the file.
+
+    Args:
+        path (str): The path to the JUnit XML report.
+        max_failures (int): The maximum number of failing test cases listed in the summary.
+
+    Returns:
+        Optional[str]: The summary text, or None if the report doesn't exist.
+    """
+    total = failed = errors = skipped = 0
+    failures: List[str] = []
+    try:
+        for _, elem in ET.iterparse(path, events=("end",)):
+            if elem.tag != "testcase":
+                continue
+            total += 1
+            for child in elem:
+                if child.tag == "skipped":
+                    skipped += 1
+                elif child.tag in ("failure", "error"):
+                    if child.tag == "failure":
+                        failed += 1
+                    else:
+                        errors += 1
+                    if len(failures) < max_failures:
+                        # Prefer the short message attribute; fall back to the first line of the traceback
+                        message = child.get("message") or (child.text or "").strip().split("\n", 1)[0]
+                        test_name = "::".join(filter(None, (elem.get("classname"), elem.get("name"))))
+                        failures.append(f"- {test_name} [{child.tag}]: {message[:MAX_MESSAGE_LENGTH]}")
+                    break
+            elem.clear()
+    except FileNotFoundError:
+        return None
+    except ET.ParseError as e:
+        return f"⚠️ Unable to parse test results XML: {e}"
+
+    passed = total - failed - errors - skipped
+    lines = [f"Tests: {total}, passed: {passed}, failed: {failed}, errors: {errors}, skipped: {skipped}"]
+    if failures:
+        lines.append("")
+        lines.append("Failed tests:")
+        lines.extend(failures)
+        if failed + errors > len(failures):
+            lines.append(f"... and {failed + errors - len(failures)} more")
+    return "\n".join(lines)